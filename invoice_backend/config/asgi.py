@@ -0,0 +1,11 @@
+"""
+ASGI entry point, e.g. `gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker`.
+Invoice metadata and PDF downloads are served by the async views, so a slow client
+holds a coroutine rather than a worker; PDF generation runs in a thread pool.
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
+application = get_asgi_application()
@@ -0,0 +1,178 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli (if the optional
+`brotli` package is installed) or gzip, for responses of at least
+COMPRESSION_MIN_SIZE bytes. Already-compressed types (PDF, zip, images) are left alone.
+Both encodings get random-length padding against BREACH: gzip in its header's file name
+field (as Django's GZipMiddleware does), brotli in a metadata block, which decoders skip.
+Replaces django.middleware.gzip.GZipMiddleware; place it near the top of MIDDLEWARE.
+"""
+import secrets
+from gzip import GzipFile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import StreamingBuffer, compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types that are already compressed; recompressing only costs CPU
+SKIP_CONTENT_TYPES = ('application/pdf', 'application/zip', 'image/', 'video/', 'audio/')
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """'gzip, br;q=0.8, *;q=0' → {'gzip': 1.0, 'br': 0.8, '*': 0.0}."""
+    codings = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name] = q
+    return codings
+
+
+def choose_encoding(header: str):
+    """Best supported coding the client accepts ('br' or 'gzip'), or None."""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0.0)
+    best, best_q = None, 0.0
+    # Listed in server preference order; a tie keeps the earlier one
+    for coding in (('br',) if brotli else ()) + ('gzip',):
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _brotli_padding(max_random_bytes: int) -> bytes:
+    """
+    A metadata meta-block of random length (RFC 7932 9.2), for a byte-aligned stream:
+    ISLAST=0, MNIBBLES=0 (metadata), MSKIPBYTES=1 and MSKIPLEN-1 packed LSB first.
+    """
+    length = secrets.randbelow(max_random_bytes)
+    if not length:
+        return b''
+    return (0b010110 | (length - 1) << 6).to_bytes(2, 'little') + b'\0' * length
+
+
+def _brotli_sequence(chunks, quality: int, max_random_bytes: int):
+    compressor = brotli.Compressor(quality=quality)
+    # flush() emits the stream header byte-aligned, so the padding block can follow it
+    yield compressor.flush() + _brotli_padding(max_random_bytes)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _brotli_compress(content: bytes, quality: int, max_random_bytes: int) -> bytes:
+    return b''.join(_brotli_sequence([content], quality, max_random_bytes))
+
+
+async def _abrotli_sequence(chunks, quality: int, max_random_bytes: int):
+    """Async _brotli_sequence, flushed after each chunk like _agzip_sequence."""
+    compressor = brotli.Compressor(quality=quality)
+    yield compressor.flush() + _brotli_padding(max_random_bytes)
+    async for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _agzip_sequence(chunks, max_random_bytes: int):
+    """
+    Async compress_sequence: one gzip member for the whole stream, flushed after each
+    chunk so a slow producer's output still reaches the client as it comes.
+    """
+    buf = StreamingBuffer()
+    filename = b'a' * secrets.randbelow(max_random_bytes)
+    with GzipFile(filename=filename, mode='wb', compresslevel=6, fileobj=buf, mtime=0) as zfile:
+        yield buf.read()
+        async for chunk in chunks:
+            zfile.write(chunk)
+            zfile.flush()
+            data = buf.read()
+            if data:
+                yield data
+    yield buf.read()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with brotli or gzip, whichever the client prefers. Sync and async."""
+
+    max_random_bytes = 100  # BREACH mitigation, as in Django's GZipMiddleware
+
+    async def __acall__(self, request):
+        """
+        Native async path. Streaming bodies only get a lazy compressor wrapped around them,
+        so that happens on the event loop (async bodies are compressed as they're consumed);
+        whole bodies worth compressing are compressed in a thread.
+        """
+        response = await self.get_response(request)
+        if response.streaming or len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return self.process_response(request, response)
+        return await sync_to_async(self.process_response, thread_sensitive=False)(request, response)
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith(SKIP_CONTENT_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                if encoding == 'br':
+                    response.streaming_content = _abrotli_sequence(
+                        response.streaming_content, settings.COMPRESSION_BROTLI_QUALITY, self.max_random_bytes,
+                    )
+                else:
+                    response.streaming_content = _agzip_sequence(response.streaming_content, self.max_random_bytes)
+            elif encoding == 'br':
+                response.streaming_content = _brotli_sequence(
+                    response.streaming_content, settings.COMPRESSION_BROTLI_QUALITY, self.max_random_bytes,
+                )
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=self.max_random_bytes,
+                )
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = _brotli_compress(
+                    response.content, settings.COMPRESSION_BROTLI_QUALITY, self.max_random_bytes,
+                )
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag would now be wrong for the encoded bytes (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
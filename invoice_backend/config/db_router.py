@@ -0,0 +1,125 @@
+"""
+Optional read replica routing.
+
+Reads go to the 'replica' alias only inside `replica_reads()` (read-only views,
+export jobs), and never while the request is pinned to the primary after a
+write or while a transaction is open on the primary. Without a 'replica'
+entry in DATABASES everything stays on 'default'.
+"""
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'db_pin'
+
+_use_replica = ContextVar('use_replica', default=False)
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+# Per-request [wrote] cell set by ReplicaStickinessMiddleware; a mutable cell so writes
+# made in sync_to_async threads (copied contexts) are seen by the middleware too
+_request_writes = ContextVar('request_writes', default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class replica_reads(ContextDecorator):
+    """Send ORM reads in this block (or decorated function) to the replica."""
+
+    def _recreate_cm(self):
+        # Fresh instance per decorated call, so concurrent/nested uses keep their own token
+        return type(self)()
+
+    def __enter__(self):
+        self._token = _use_replica.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _use_replica.reset(self._token)
+        return False
+
+
+class ReplicaRouter:
+    """Database router: writes and migrations on 'default', opted-in reads on 'replica'."""
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or _pinned_to_primary.get() or not replica_configured():
+            return None
+        if connections['default'].in_atomic_block:
+            return None
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes[0] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary through replication
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-writes: after a POST/PUT/PATCH/DELETE that wrote to the database, set a
+    short-lived cookie; requests carrying it read from the primary until replica lag has
+    passed. Read-only POSTs (e.g. invoice preview) don't pin the client.
+    """
+
+    UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        writes = [False]
+        token = _pinned_to_primary.set(self._pinned(request))
+        writes_token = _request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_writes.reset(writes_token)
+            _pinned_to_primary.reset(token)
+        return self._set_pin(request, response, writes[0])
+
+    async def __acall__(self, request):
+        writes = [False]
+        token = _pinned_to_primary.set(self._pinned(request))
+        writes_token = _request_writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_writes.reset(writes_token)
+            _pinned_to_primary.reset(token)
+        return self._set_pin(request, response, writes[0])
+
+    def _pinned(self, request) -> bool:
+        return request.method in self.UNSAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    def _set_pin(self, request, response, wrote: bool):
+        if wrote and request.method in self.UNSAFE_METHODS and replica_configured():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,48 @@
+"""
+Fast JSON renderer for the API.
+
+Uses orjson when installed (optional; falls back to DRF's JSONRenderer). Output matches
+DRF's: same date/time formats, UTF-8, U+2028/U+2029 escaped, and Decimals as JSON numbers.
+With orjson >= 3.9 Decimals are written digit for digit (118.00, not 118.0) instead
+of going through float.
+"""
+import decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_Fragment = getattr(orjson, 'Fragment', None)
+_drf_default = JSONEncoder().default
+
+
+def _default(obj):
+    """Types orjson doesn't encode itself, formatted as DRF's encoder does."""
+    if isinstance(obj, decimal.Decimal):
+        if _Fragment is not None and obj.is_finite():
+            return _Fragment(str(obj).encode())
+        return float(obj)
+    return _drf_default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in JSONRenderer; pretty-printed (indent) requests still go through DRF."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(
+            data,
+            default=_default,
+            # OPT_UTC_Z: UTC datetimes end in 'Z', as with DRF's encoder
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
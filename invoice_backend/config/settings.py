@@ -4,6 +4,7 @@ Use environment variables or .env for production secrets.
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -39,9 +40,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'config.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'config.db_router.ReplicaStickinessMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -102,9 +105,71 @@ DATABASES = {
 if os.environ.get('USE_SQLITE') == '1':
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': BASE_DIR / os.environ.get('SQLITE_NAME', 'db.sqlite3'),
+        'OPTIONS': {
+            # Write transactions take the database lock at BEGIN and queue for it (up to
+            # timeout seconds) instead of failing with "database is locked" when a read
+            # transaction later tries to write; WAL lets readers run alongside the writer.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            'init_command': 'PRAGMA journal_mode=WAL;',
+        },
+    }
+
+# Optional read replica for read-only views and exports (see config/db_router.py).
+# MySQL: set MYSQL_REPLICA_HOST. SQLite (local testing): set SQLITE_REPLICA_NAME to a second file.
+if os.environ.get('USE_SQLITE') == '1':
+    if os.environ.get('SQLITE_REPLICA_NAME'):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / os.environ['SQLITE_REPLICA_NAME'],
+            'TEST': {'MIRROR': 'default'},
+        }
+elif os.environ.get('MYSQL_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['MYSQL_REPLICA_HOST'],
+        'PORT': os.environ.get('MYSQL_REPLICA_PORT', DATABASES['default']['PORT']),
+        'USER': os.environ.get('MYSQL_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('MYSQL_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
     }
 
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+
+# Seconds a client reads from the primary after a write (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '10'))
+
+
+# -----------------------
+# PDF render admission control (see invoices/admission.py)
+# -----------------------
+
+# Renders running at once across all workers on this host
+PDF_RENDER_CONCURRENCY = int(os.environ.get('PDF_RENDER_CONCURRENCY', '2'))
+# Requests allowed to wait for a slot, across workers and within one worker
+PDF_RENDER_QUEUE_SIZE = int(os.environ.get('PDF_RENDER_QUEUE_SIZE', '4'))
+PDF_RENDER_WORKER_QUEUE_SIZE = int(os.environ.get('PDF_RENDER_WORKER_QUEUE_SIZE', '2'))
+# Seconds a queued request waits before getting 503 (keep well under gunicorn's timeout)
+PDF_RENDER_QUEUE_TIMEOUT = float(os.environ.get('PDF_RENDER_QUEUE_TIMEOUT', '10'))
+# Lock files shared by the workers; must be on a local filesystem
+PDF_RENDER_LOCK_DIR = os.environ.get(
+    'PDF_RENDER_LOCK_DIR',
+    os.path.join(tempfile.gettempdir(), 'invoice_render_slots'),
+)
+
+# Compact invoice PDFs: binary Flate streams, plus object streams if pikepdf is installed
+PDF_COMPACT = os.environ.get('PDF_COMPACT', '1') == '1'
+# Linearized ("fast web view") PDFs; needs pikepdf, and adds ~1 KB per invoice
+PDF_LINEARIZE = os.environ.get('PDF_LINEARIZE', '0') == '1'
+
+# Seconds an invoice preview (POST /api/invoice-preview/) stays in the cache
+INVOICE_PREVIEW_CACHE_SECONDS = int(os.environ.get('INVOICE_PREVIEW_CACHE_SECONDS', '300'))
+
+# Route invoice metadata/download to the async views (invoices/async_views.py).
+# config/asgi.py turns this on; keep it off under WSGI.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
 
 # -----------------------
 # Localization
@@ -140,10 +205,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'config.renderers.FastJSONRenderer',
     ],
 }
 
+# Responses smaller than this are sent uncompressed (see config/compression.py)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+# Brotli quality 0-11; 4-5 is the usual trade-off for dynamic responses
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+
 
 # -----------------------
 # CORS
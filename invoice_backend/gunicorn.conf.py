@@ -0,0 +1,29 @@
+"""
+Gunicorn settings, picked up automatically from the working directory.
+Prewarms reportlab so the first invoice request in a worker isn't slow.
+"""
+import os
+
+# Load Django in the master and fork workers from it, so prewarmed modules are shared.
+# Set GUNICORN_PRELOAD=0 to disable (e.g. when using --reload locally).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def _prewarm_pdf(log):
+    try:
+        from invoices.pdf_generator import prewarm
+        prewarm()
+    except Exception:
+        log.exception("Invoice PDF prewarm failed")
+
+
+def when_ready(server):
+    """Preloaded master: warm once before forking so workers inherit it."""
+    if preload_app:
+        _prewarm_pdf(server.log)
+
+
+def post_fork(server, worker):
+    """Without preload each worker imports the app itself, so warm it there."""
+    if not preload_app:
+        _prewarm_pdf(worker.log)
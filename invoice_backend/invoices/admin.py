@@ -1,5 +1,18 @@
 from django.contrib import admin
-from .models import Shop, Customer, Order, OrderItem, Invoice
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import Shop, Product, Customer, Order, OrderItem, Invoice, ArchivedOrder
+from .pagination import EstimatedCountPaginator
+
+# Orders with more items than this link to the paginated item list instead of an inline
+MAX_INLINE_ITEMS = 100
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # avoids a second COUNT(*) when filtering
 
 
 @admin.register(Shop)
@@ -7,22 +20,82 @@ class ShopAdmin(admin.ModelAdmin):
     list_display = ('name', 'gstin', 'state_code', 'is_default')
 
 
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'liters_per_can', 'quantity', 'dp', 'gst_percent', 'is_active')
+
+
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ('name', 'phone', 'state_code', 'email')
+    search_fields = ('^name', '=phone', '=gstin')
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    ordering = ('sno',)  # Meta.ordering's 'order' would join invoices_order for its date
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ('id', 'customer', 'order_date', 'total_amount', 'is_inter_state')
+    list_select_related = ('customer',)
+    raw_id_fields = ('customer',)
+    date_hierarchy = 'order_date'
+    search_fields = ('=id', '^customer__name', '=customer__phone')
+    readonly_fields = ('items_link',)
     inlines = [OrderItemInline]
 
+    def get_inlines(self, request, obj):
+        # An inline renders every item in one form; large orders use the item changelist
+        if obj is not None and obj.items.count() > MAX_INLINE_ITEMS:
+            return []
+        return super().get_inlines(request, obj)
+
+    @admin.display(description='Items')
+    def items_link(self, obj):
+        if obj.pk is None:
+            return '-'
+        url = reverse('admin:invoices_orderitem_changelist') + f'?order__id__exact={obj.pk}'
+        return format_html('<a href="{}">View items</a>', url)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('order_id', 'sno', 'description', 'hsn_sac', 'quantity', 'rate', 'amount')
+    raw_id_fields = ('order',)
+    search_fields = ('=order__id',)
+    # The (order_id, sno) unique index, no join: Meta.ordering's 'order' sorts by order date
+    ordering = ('order_id', 'sno')
+
 
 @admin.register(Invoice)
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(LargeTableAdmin):
     list_display = ('invoice_no', 'order', 'invoice_date', 'created_at')
+    list_select_related = ('order__customer',)  # Order.__str__ shows the customer name
+    raw_id_fields = ('order',)
+    date_hierarchy = 'invoice_date'
+    search_fields = ('=invoice_no', '=order__id')
+    readonly_fields = ('snapshot',)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            qs = qs.defer('snapshot')
+        return qs
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'invoice_no', 'customer', 'order_date', 'total_amount', 'financial_year')
+    list_filter = ('financial_year',)
+    list_select_related = ('customer',)
+    raw_id_fields = ('customer',)
+    search_fields = ('=id', '=invoice_no')
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            qs = qs.defer('items', 'invoice_snapshot')
+        return qs
@@ -0,0 +1,231 @@
+"""
+Admission control for PDF rendering.
+
+At most PDF_RENDER_CONCURRENCY renders run at once across all workers on the host,
+with at most PDF_RENDER_QUEUE_SIZE requests waiting for a slot (and at most
+PDF_RENDER_WORKER_QUEUE_SIZE of those in one worker). Anything beyond that, or a
+request that waits longer than PDF_RENDER_QUEUE_TIMEOUT, is rejected with
+RenderBusyError so the view can answer 503 + Retry-After instead of tying up the worker.
+
+Slots and queue places are flock()ed files in PDF_RENDER_LOCK_DIR; the kernel
+releases them if a worker dies. The holder writes its pid into the file, so occupancy
+is read without touching the locks. Without fcntl (Windows) the limits are per process.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Poll interval while waiting for a render slot (doubles up to the max)
+_POLL_START = 0.02
+_POLL_MAX = 0.2
+
+
+class RenderBusyError(Exception):
+    """Raised when no render slot is available; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _FileSlots:
+    """N interchangeable slots shared between processes, one lock file per slot."""
+
+    def __init__(self, directory: str, name: str, count: int):
+        self.paths = [os.path.join(directory, f'{name}.{i}.lock') for i in range(count)]
+
+    def try_acquire(self):
+        """Open file holding a free slot, or None if all are taken."""
+        for path in self.paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, str(os.getpid()).encode(), 0)
+            return fd
+        return None
+
+    @staticmethod
+    def release(fd) -> None:
+        os.ftruncate(fd, 0)
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def in_use(self) -> int:
+        """
+        Number of slots currently held, read from the holders' pid records rather than
+        by trying the locks (which would briefly take a free slot from a real request).
+        A record left by a worker that died counts only while its pid is alive.
+        """
+        busy = 0
+        for path in self.paths:
+            try:
+                with open(path, 'rb') as f:
+                    pid = int(f.read() or 0)
+            except (OSError, ValueError):
+                continue
+            if pid and _pid_alive(pid):
+                busy += 1
+        return busy
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+class _LocalSlots:
+    """Per-process fallback with the same interface as _FileSlots."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self._used >= self.count:
+                return None
+            self._used += 1
+            return True
+
+    def release(self, token) -> None:
+        with self._lock:
+            self._used -= 1
+
+    def in_use(self) -> int:
+        return self._used
+
+
+class RenderAdmission:
+    """Process-wide limiter; use the module-level `admission` instance."""
+
+    def __init__(self):
+        self._init_lock = threading.Lock()
+        self._slots = None
+        self._queue = None
+        self._worker_queue = None
+        self.concurrency = self.queue_size = 0
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'admitted': 0,
+            'rejected_queue_full': 0,
+            'rejected_timeout': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'render_seconds_total': 0.0,
+        }
+
+    def _setup(self):
+        if self._slots is not None:
+            return
+        with self._init_lock:
+            if self._slots is not None:
+                return
+            self.concurrency = max(1, settings.PDF_RENDER_CONCURRENCY)
+            self.queue_size = max(0, settings.PDF_RENDER_QUEUE_SIZE)
+            self._worker_queue = _LocalSlots(max(0, settings.PDF_RENDER_WORKER_QUEUE_SIZE))
+            if fcntl is None:
+                self._queue = _LocalSlots(self.queue_size)
+                self._slots = _LocalSlots(self.concurrency)
+            else:
+                directory = str(settings.PDF_RENDER_LOCK_DIR)
+                os.makedirs(directory, exist_ok=True)
+                self._queue = _FileSlots(directory, 'queue', self.queue_size)
+                self._slots = _FileSlots(directory, 'render', self.concurrency)
+
+    def _count(self, key: str, value=1) -> None:
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: average render time × queued renders per slot."""
+        with self._stats_lock:
+            admitted = self.stats['admitted']
+            average = self.stats['render_seconds_total'] / admitted if admitted else 1.0
+        return max(1, math.ceil(average * (self.queue_size + 1) / self.concurrency))
+
+    @contextmanager
+    def slot(self):
+        """Hold a render slot for the block; raises RenderBusyError if none can be had in time."""
+        self._setup()
+        started = time.monotonic()
+        slot = self._slots.try_acquire()
+        if slot is None:
+            slot = self._wait_for_slot(started)
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            self.stats['admitted'] += 1
+            self.stats['wait_seconds_total'] += waited
+            self.stats['wait_seconds_max'] = max(self.stats['wait_seconds_max'], waited)
+        if waited >= _POLL_START:
+            logger.info("PDF render admitted after %.3fs wait", waited)
+        try:
+            yield
+        finally:
+            self._count('render_seconds_total', time.monotonic() - started - waited)
+            self._slots.release(slot)
+
+    def _wait_for_slot(self, started: float):
+        local_place = self._worker_queue.try_acquire()
+        place = self._queue.try_acquire() if local_place is not None else None
+        if place is None:
+            if local_place is not None:
+                self._worker_queue.release(local_place)
+            self._count('rejected_queue_full')
+            logger.warning("PDF render rejected: wait queue full")
+            raise RenderBusyError("Invoice rendering is busy, please retry.", self.retry_after())
+        try:
+            deadline = started + settings.PDF_RENDER_QUEUE_TIMEOUT
+            delay = _POLL_START
+            while True:
+                slot = self._slots.try_acquire()
+                if slot is not None:
+                    return slot
+                if time.monotonic() + delay > deadline:
+                    self._count('rejected_timeout')
+                    logger.warning("PDF render rejected after %.1fs in queue", time.monotonic() - started)
+                    raise RenderBusyError("Invoice rendering is busy, please retry.", self.retry_after())
+                time.sleep(delay)
+                delay = min(delay * 2, _POLL_MAX)
+        finally:
+            self._queue.release(place)
+            self._worker_queue.release(local_place)
+
+    def status(self) -> dict:
+        """Host-wide slot/queue occupancy plus this worker's counters."""
+        self._setup()
+        with self._stats_lock:
+            worker = dict(self.stats)
+        admitted = worker['admitted']
+        worker['wait_seconds_avg'] = worker['wait_seconds_total'] / admitted if admitted else 0.0
+        return {
+            'concurrency': self.concurrency,
+            'rendering': self._slots.in_use(),
+            'queued': self._queue.in_use(),
+            'queue_size': self.queue_size,
+            'worker': {k: round(v, 4) if isinstance(v, float) else v for k, v in worker.items()},
+        }
+
+
+admission = RenderAdmission()
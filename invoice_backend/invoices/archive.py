@@ -0,0 +1,244 @@
+"""
+Year-based archival: move orders, items and invoices of a closed financial year
+out of the hot tables into ArchivedOrder, and their PDFs into one zip pack per year.
+Lookups fall back to the archive when an order is no longer in the hot tables.
+"""
+import datetime
+import os
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from .models import Order, OrderItem, Invoice, ArchivedOrder
+from .services import InvoiceGenerationService
+from .snapshot import build_snapshot, item_row
+
+ARCHIVE_DIR = 'archive'
+
+
+class ArchiveError(Exception):
+    """Raised when a financial year cannot be archived (e.g. not closed yet)."""
+    pass
+
+
+def financial_year_bounds(financial_year: int):
+    """Aware datetimes [start, end) for Indian FY starting 1 April of financial_year."""
+    tz = timezone.get_current_timezone()
+    start = datetime.datetime(financial_year, 4, 1, tzinfo=tz)
+    end = datetime.datetime(financial_year + 1, 4, 1, tzinfo=tz)
+    return start, end
+
+
+def financial_year_label(financial_year: int) -> str:
+    """2024 → 'FY2024-25'."""
+    return f"FY{financial_year}-{(financial_year + 1) % 100:02d}"
+
+
+class ArchiveService:
+    """Service layer for archiving closed financial years and reading them back."""
+
+    @staticmethod
+    def pack_name(financial_year: int) -> str:
+        return f"{ARCHIVE_DIR}/invoices_{financial_year_label(financial_year)}.zip"
+
+    @classmethod
+    def archive_financial_year(cls, financial_year: int, batch_size: int = 500, dry_run: bool = False) -> dict:
+        """
+        Archive every order dated in the financial year, batch by batch.
+        Each batch: PDFs are appended to the year's pack first, then rows are copied and
+        deleted in one transaction, then the original PDF files are removed. Safe to rerun
+        after a crash: packed PDFs are not added twice and archived orders are gone from the hot tables.
+        """
+        start, end = financial_year_bounds(financial_year)
+        if end > timezone.now():
+            raise ArchiveError(f"{financial_year_label(financial_year)} is not closed yet.")
+        try:
+            default_storage.path(ARCHIVE_DIR)
+        except NotImplementedError:
+            # Packs are appended to in place, which needs a real file
+            raise ArchiveError("Archiving needs media on the local filesystem (FileSystemStorage).")
+
+        orders = Order.objects.filter(order_date__gte=start, order_date__lt=end)
+        stats = {'orders': 0, 'items': 0, 'invoices': 0, 'pdfs': 0}
+        if dry_run:
+            stats['orders'] = orders.count()
+            stats['items'] = OrderItem.objects.filter(order__in=orders).count()
+            stats['invoices'] = Invoice.objects.filter(order__in=orders).count()
+            stats['pdfs'] = Invoice.objects.filter(order__in=orders).exclude(pdf_file='').exclude(pdf_file=None).count()
+            return stats
+
+        pack = cls.pack_name(financial_year)
+        last_pk = 0
+        while True:
+            batch = list(
+                orders.filter(pk__gt=last_pk)
+                .select_related('invoice', 'customer')
+                .prefetch_related('items', 'invoice__lines')
+                .order_by('pk')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            invoices = [order.invoice for order in batch if hasattr(order, 'invoice')]
+            packed = cls._pack_pdfs(pack, invoices)
+
+            with transaction.atomic():
+                ArchivedOrder.objects.bulk_create([
+                    cls._to_archived(order, financial_year, pack, packed) for order in batch
+                ])
+                order_ids = [order.pk for order in batch]
+                stats['items'] += OrderItem.objects.filter(order_id__in=order_ids).delete()[0]
+                # Counted per model: the invoices' lines go with them
+                stats['invoices'] += Invoice.objects.filter(order_id__in=order_ids).delete()[1].get(Invoice._meta.label, 0)
+                Order.objects.filter(pk__in=order_ids).delete()
+            stats['orders'] += len(batch)
+            stats['pdfs'] += len(packed)
+
+            for invoice in invoices:
+                if invoice.pdf_file and invoice.pdf_file.name in packed:
+                    invoice.pdf_file.delete(save=False)
+        return stats
+
+    @staticmethod
+    def _pack_pdfs(pack: str, invoices) -> dict:
+        """
+        Append invoice PDFs to the zip pack; returns {storage name: member name}. Members
+        are named by storage name, which is unique where base names are not (months).
+        """
+        packed = {}
+        with_pdf = [inv for inv in invoices if inv.pdf_file]
+        if not with_pdf:
+            return packed
+        pack_path = default_storage.path(pack)
+        os.makedirs(os.path.dirname(pack_path), exist_ok=True)
+        with zipfile.ZipFile(pack_path, 'a', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+            existing = set(zf.namelist())
+            for invoice in with_pdf:
+                member = invoice.pdf_file.name
+                if member not in existing:
+                    try:
+                        with invoice.pdf_file.open('rb') as f:
+                            zf.writestr(member, f.read())
+                    except (OSError, ValueError):
+                        continue  # PDF missing on disk; archive the row without it
+                packed[invoice.pdf_file.name] = member
+        return packed
+
+    @staticmethod
+    def _archived_snapshot(order, invoice):
+        """
+        Invoice.snapshot with its lines folded back in, as InvoiceLine rows are not archived.
+        Invoices from before snapshots get one built from the order as it is now (what
+        get_snapshot would freeze), so every archived invoice can be rendered.
+        """
+        if not invoice.snapshot:
+            shop = InvoiceGenerationService.get_shop()
+            return {
+                **build_snapshot(shop, order, invoice.invoice_no, invoice.invoice_date),
+                'items': [item_row(item) for item in sorted(order.items.all(), key=lambda i: i.sno)],
+            }
+        if 'items' in invoice.snapshot:
+            return invoice.snapshot
+        return {**invoice.snapshot, 'items': [item_row(line) for line in invoice.lines.all()]}
+
+    @classmethod
+    def _to_archived(cls, order, financial_year: int, pack: str, packed: dict) -> ArchivedOrder:
+        invoice = getattr(order, 'invoice', None)
+        member = packed.get(invoice.pdf_file.name, '') if invoice and invoice.pdf_file else ''
+        return ArchivedOrder(
+            id=order.pk,
+            financial_year=financial_year,
+            customer_id=order.customer_id,
+            order_date=order.order_date,
+            total_before_tax=order.total_before_tax,
+            cgst_amount=order.cgst_amount,
+            sgst_amount=order.sgst_amount,
+            igst_amount=order.igst_amount,
+            total_amount=order.total_amount,
+            is_inter_state=order.is_inter_state,
+            items=[
+                {
+                    'sno': item.sno,
+                    'description': item.description,
+                    'hsn_sac': item.hsn_sac,
+                    'quantity': str(item.quantity),
+                    'rate': str(item.rate),
+                    'amount': str(item.amount),
+                }
+                for item in sorted(order.items.all(), key=lambda i: i.sno)
+            ],
+            invoice_no=invoice.invoice_no if invoice else None,
+            invoice_date=invoice.invoice_date if invoice else None,
+            invoice_created_at=invoice.created_at if invoice else None,
+            invoice_snapshot=cls._archived_snapshot(order, invoice) if invoice else None,
+            pdf_pack=pack if member else '',
+            pdf_member=member,
+        )
+
+    @staticmethod
+    def find_archived_invoice(order_id):
+        """Archived order that had an invoice, or None. has_snapshot: it can be rendered."""
+        return (
+            ArchivedOrder.objects.filter(pk=order_id, invoice_no__isnull=False)
+            .annotate(has_snapshot=ExpressionWrapper(Q(invoice_snapshot__isnull=False), output_field=BooleanField()))
+            .defer('items', 'invoice_snapshot')
+            .first()
+        )
+
+    @staticmethod
+    def open_archived_pdf(archived: ArchivedOrder) -> 'ArchivedPdf':
+        """
+        Open the PDF inside the year's pack for streaming, through the storage's open()
+        (so any seekable storage works for reads). Raises OSError/KeyError if missing.
+        """
+        if not archived.pdf_pack:
+            raise KeyError(archived.pk)
+        pack_file = default_storage.open(archived.pdf_pack, 'rb')
+        try:
+            return ArchivedPdf(pack_file, archived.pdf_member)
+        except BaseException:
+            pack_file.close()
+            raise
+
+    @staticmethod
+    def render_archived_pdf(archived: ArchivedOrder):
+        """
+        Render an archived invoice that has no packed PDF from its invoice_snapshot into a
+        temp file, positioned at the start; packs stay as archive_year wrote them.
+        Callers hold a render slot and close the file. Raises KeyError without a snapshot.
+        """
+        snapshot = archived.invoice_snapshot
+        if not snapshot:
+            raise KeyError(archived.pk)
+        pdf_file = InvoiceGenerationService.render_snapshot(snapshot, snapshot['items'])
+        pdf_file.seek(0)
+        return pdf_file
+
+
+class ArchivedPdf:
+    """Read-only stream of one member of a pack; closing it closes the pack too."""
+
+    def __init__(self, pack_file, member: str):
+        self._pack_file = pack_file
+        try:
+            self._zip = zipfile.ZipFile(pack_file)
+        except zipfile.BadZipFile as e:
+            raise OSError(str(e))
+        try:
+            self.size = self._zip.getinfo(member).file_size
+            self._member = self._zip.open(member)
+        except BaseException:
+            self._zip.close()
+            raise
+
+    def read(self, size: int = -1) -> bytes:
+        return self._member.read(size)
+
+    def close(self) -> None:
+        self._member.close()
+        self._zip.close()
+        self._pack_file.close()
@@ -0,0 +1,241 @@
+"""
+Async versions of the invoice metadata, PDF download and GST export endpoints, routed
+instead of the DRF views when settings.ASYNC_VIEWS is on (config/asgi.py). Same URLs,
+bodies and status codes (OPTIONS is answered by the DRF view itself). Reads use the async
+ORM, PDFs and exports are streamed in chunks produced off the event loop, and generation
+(render + optional email) runs in a thread pool, so slow clients and slow SMTP servers
+wait on coroutines instead of holding a worker.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import FileResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from config.db_router import replica_reads
+
+from . import views
+from .admission import admission, RenderBusyError
+from .archive import ArchiveService
+from .models import Invoice
+from .services import InvoiceGenerationService, InvoiceGenerationError
+
+# Bytes read from storage per chunk when streaming a PDF
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _not_found(message: str) -> JsonResponse:
+    # Same body as DRF's Http404 handling in views.py
+    return JsonResponse({'detail': message}, status=404)
+
+
+def _render_busy(e: RenderBusyError) -> JsonResponse:
+    response = JsonResponse({'error': str(e)}, status=503)
+    response['Retry-After'] = str(e.retry_after)
+    return response
+
+
+async def _options(drf_view, request, **kwargs):
+    """OPTIONS from the DRF view the async view stands in for: same Allow header and metadata."""
+    return await sync_to_async(drf_view)(request, **kwargs)
+
+
+class _RenderPool:
+    """
+    Threads for generate_for_order. Sized to what admission lets one worker have in
+    flight (every render slot plus its queue places); anything beyond would be rejected
+    by admission anyway, so it gets 503 here instead of waiting for a thread.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self.size = 0
+        self.in_flight = 0  # only touched from the event loop
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self.size = max(1, settings.PDF_RENDER_CONCURRENCY + settings.PDF_RENDER_WORKER_QUEUE_SIZE)
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='invoice-render')
+        return self._executor
+
+    async def run(self, func, *args):
+        executor = self._get_executor()
+        if self.in_flight >= self.size:
+            raise RenderBusyError("Invoice rendering is busy, please retry.", admission.retry_after())
+        self.in_flight += 1
+        try:
+            return await sync_to_async(func, thread_sensitive=False, executor=executor)(*args)
+        finally:
+            self.in_flight -= 1
+
+
+_render_pool = _RenderPool()
+
+
+def _generate(order_id: int, email_invoice: bool) -> Invoice:
+    # Pool threads outlive requests, so apply CONN_MAX_AGE here as the request signals do
+    close_old_connections()
+    try:
+        return InvoiceGenerationService.generate_for_order(order_id=order_id, email_invoice=email_invoice)
+    finally:
+        close_old_connections()
+
+
+def _render_archived(archived):
+    close_old_connections()
+    try:
+        with admission.slot():
+            return ArchiveService.render_archived_pdf(archived)
+    finally:
+        close_old_connections()
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'POST', 'OPTIONS'])
+async def generate_invoice(request, order_id):
+    """
+    Generate invoice for order_id (async variant of views.generate_invoice).
+    POST: Generate (optionally ?email=1 to email invoice).
+    GET: If invoice exists, return metadata and download link; else 404.
+    """
+    if request.method == 'OPTIONS':
+        return await _options(views.generate_invoice, request, order_id=order_id)
+    if request.method != 'POST':
+        with replica_reads():
+            invoice = await Invoice.objects.filter(order_id=order_id).defer('snapshot').afirst()
+            archived = None if invoice else await sync_to_async(ArchiveService.find_archived_invoice)(order_id)
+        if archived:
+            return JsonResponse({
+                'invoice_no': archived.invoice_no,
+                'invoice_date': str(archived.invoice_date),
+                'order_id': order_id,
+                'pdf_url': request.build_absolute_uri(f'/api/invoice/{order_id}/pdf/') if archived.pdf_member or archived.has_snapshot else None,
+                'archived': True,
+            })
+        if not invoice:
+            return _not_found("Invoice not found for this order.")
+        return JsonResponse({
+            'invoice_no': invoice.invoice_no,
+            'invoice_date': str(invoice.invoice_date),
+            'order_id': order_id,
+            'pdf_url': request.build_absolute_uri(invoice.pdf_file.url if invoice.pdf_file else f'/api/invoice/{order_id}/pdf/'),
+        })
+
+    # POST
+    email_invoice = request.GET.get('email', '').lower() in ('1', 'true', 'yes')
+    try:
+        invoice = await _render_pool.run(_generate, int(order_id), email_invoice)
+    except InvoiceGenerationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except RenderBusyError as e:
+        return _render_busy(e)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid order_id'}, status=400)
+
+    pdf_url = request.build_absolute_uri(invoice.pdf_file.url) if invoice.pdf_file else None
+    return JsonResponse({
+        'invoice_no': invoice.invoice_no,
+        'invoice_date': str(invoice.invoice_date),
+        'order_id': order_id,
+        'pdf_url': pdf_url,
+        'message': 'Invoice generated successfully.',
+    }, status=201)
+
+
+async def _read_chunks(f):
+    """File contents as an async iterator; each read runs in a thread, not on the event loop."""
+    read = sync_to_async(f.read, thread_sensitive=False)
+    while chunk := await read(STREAM_CHUNK_SIZE):
+        yield chunk
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'OPTIONS'])
+async def download_invoice_pdf(request, order_id):
+    """Download PDF for order (async variant of views.download_invoice_pdf)."""
+    if request.method == 'OPTIONS':
+        return await _options(views.download_invoice_pdf, request, order_id=order_id)
+    with replica_reads():
+        invoice = await Invoice.objects.filter(order_id=order_id).defer('snapshot').afirst()
+        if not invoice:
+            return await _download_archived_pdf(order_id)
+    if not invoice.pdf_file:
+        # Imported history: render the PDF now, in the render pool like POST generate
+        try:
+            invoice = await _render_pool.run(_generate, invoice.order_id, False)
+        except RenderBusyError as e:
+            return _render_busy(e)
+        except InvoiceGenerationError:
+            return _not_found("Invoice or PDF not found.")
+    try:
+        f = await sync_to_async(invoice.pdf_file.open, thread_sensitive=False)('rb')
+    except (OSError, ValueError):
+        return _not_found("File not found.")
+    # FileResponse works out the headers and closes the file; the body is read asynchronously
+    response = FileResponse(f, as_attachment=True, filename=views.download_name(invoice.invoice_no))
+    response.streaming_content = _read_chunks(f)
+    return response
+
+
+async def _download_archived_pdf(order_id):
+    """Serve the PDF of an archived order from its pack, or rendered from its snapshot."""
+    archived = await sync_to_async(ArchiveService.find_archived_invoice)(order_id)
+    if not archived:
+        return _not_found("Invoice or PDF not found.")
+    if not archived.pdf_pack:
+        try:
+            pdf = await _render_pool.run(_render_archived, archived)
+        except RenderBusyError as e:
+            return _render_busy(e)
+        except KeyError:
+            return _not_found("Invoice or PDF not found.")
+        response = FileResponse(pdf, as_attachment=True, filename=views.download_name(archived.invoice_no))
+        response.streaming_content = _read_chunks(pdf)
+        return response
+    try:
+        pdf = await sync_to_async(ArchiveService.open_archived_pdf, thread_sensitive=False)(archived)
+    except (OSError, KeyError):
+        return _not_found("File not found.")
+    response = FileResponse(
+        pdf, as_attachment=True, filename=views.download_name(archived.invoice_no), content_type='application/pdf',
+    )
+    response['Content-Length'] = str(pdf.size)
+    response.streaming_content = _read_chunks(pdf)
+    return response
+
+
+async def _iter_sync_body(chunks):
+    """
+    A sync streaming body as an async iterator, one chunk per thread hop. Given to
+    Django as is, a sync iterator is read fully into memory before anything is sent.
+    Chunks are pulled in the request's sync thread (thread_sensitive), where the view's
+    database connection lives, and in one saved context so the generator's context
+    variables (replica_reads) carry over from chunk to chunk.
+    """
+    context = contextvars.copy_context()
+    chunks = iter(chunks)
+    pull = sync_to_async(lambda: context.run(next, chunks, None))
+    try:
+        while (chunk := await pull()) is not None:
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(context.run)(close)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'OPTIONS'])
+async def gst_export(request, kind):
+    """
+    GST filing export (async variant of views.gst_export). The DRF view checks the request
+    and builds the export; its body is then streamed without buffering (see _iter_sync_body).
+    """
+    response = await sync_to_async(views.gst_export)(request, kind=kind)
+    if response.streaming and not response.is_async:
+        response.streaming_content = _iter_sync_body(response.streaming_content)
+    return response
@@ -0,0 +1,400 @@
+"""
+Bulk import of historical orders and invoices (paper/Excel history) from CSV or JSON Lines.
+Records are streamed and validated, customers are deduplicated in memory, and each batch
+of orders is written with one bulk_create per table in one transaction, with foreign keys
+resolved in memory. Invoice numbers, dates and (optional) totals are kept as given; PDFs
+are not rendered here (the first download or generate request renders a missing one).
+"""
+import csv
+import datetime
+import json
+import re
+import uuid
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import groupby, islice
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import ArchivedOrder, ChangeCounter, Customer, Invoice, InvoiceLine, Order, OrderItem
+from .invoice_number import reserve_invoice_numbers
+from .search import SearchIndex, customer_text
+from .serializers import CustomerSerializer, OrderItemSerializer, _fast_item
+from .services import InvoiceGenerationService
+from .snapshot import CUSTOMER_FIELDS, ITEM_FIELDS, TOTAL_FIELDS, build_snapshot
+from .utils import get_tax_breakdown
+
+# Imported orders get client_id = uuid5(IMPORT_NAMESPACE, invoice_no): reruns can tell
+# their own invoices from live ones, and the unique client_id blocks a second copy.
+IMPORT_NAMESPACE = uuid.UUID('71e88ba8-03b7-4c81-94b4-68ce39bf9f46')
+
+# CSV layout: one row per line item, rows of one invoice next to each other
+CSV_COLUMNS = (
+    'invoice_no', 'invoice_date', 'order_date',
+    *(f'customer_{field}' for field in CUSTOMER_FIELDS),
+    *ITEM_FIELDS,
+    *TOTAL_FIELDS,
+)
+ORDER_TOTAL_FIELDS = TOTAL_FIELDS + ('is_inter_state',)
+TAX_FIELDS = ('cgst_amount', 'sgst_amount', 'igst_amount')
+# Validates given totals like the Order columns they are stored in
+_TOTAL = serializers.DecimalField(
+    max_digits=Order._meta.get_field('total_amount').max_digits, decimal_places=2, min_value=Decimal('0'),
+)
+
+_INVOICE_NO_MAX_LENGTH = Invoice._meta.get_field('invoice_no').max_length
+_NON_DIGITS = re.compile(r'\D')
+_PAISE = Decimal('0.01')
+
+
+class BulkImportError(Exception):
+    """Raised for unreadable input or a record that cannot be imported."""
+    pass
+
+
+def read_records(f, fmt: str):
+    """
+    Raw records from an open text file, one per invoice: {invoice_no, invoice_date,
+    order_date, customer: {...}, items: [{...}], totals: {...}}. fmt 'jsonl' reads one such
+    object per line; 'csv' reads CSV_COLUMNS rows and groups consecutive rows by invoice_no
+    (customer and totals from the invoice's first row).
+    """
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise BulkImportError(f"Line {line_no}: invalid JSON ({e}).")
+            if not isinstance(record, dict):
+                raise BulkImportError(f"Line {line_no}: expected a JSON object.")
+            yield record
+        return
+    if fmt != 'csv':
+        raise BulkImportError(f"Unknown input format {fmt!r}.")
+    reader = csv.DictReader(f)
+    missing = {'invoice_no', 'invoice_date', 'customer_name', 'description', 'quantity', 'rate'} - set(reader.fieldnames or ())
+    if missing:
+        raise BulkImportError(f"CSV header is missing columns: {', '.join(sorted(missing))}.")
+    for invoice_no, rows in groupby(reader, key=lambda row: (row['invoice_no'] or '').strip()):
+        rows = list(rows)
+        first = rows[0]
+        yield {
+            'invoice_no': invoice_no,
+            'invoice_date': first['invoice_date'],
+            'order_date': first.get('order_date'),
+            'customer': {field: first.get(f'customer_{field}') or '' for field in CUSTOMER_FIELDS},
+            'items': [{field: row.get(field) for field in ITEM_FIELDS} for row in rows],
+            'totals': {field: first.get(field) for field in TOTAL_FIELDS},
+        }
+
+
+def customer_key(customer: dict) -> tuple:
+    """Dedupe key: GSTIN when there is one, else name (case-insensitive) plus phone digits."""
+    gstin = (customer.get('gstin') or '').strip().upper()
+    if gstin:
+        return ('gstin', gstin)
+    return ('name', (customer.get('name') or '').strip().casefold(), _NON_DIGITS.sub('', customer.get('phone') or ''))
+
+
+def import_client_id(invoice_no: str) -> uuid.UUID:
+    return uuid.uuid5(IMPORT_NAMESPACE, invoice_no)
+
+
+class BulkImportService:
+    """Service layer for importing historical orders with their invoices."""
+
+    @classmethod
+    def run(cls, records, batch_size: int = 1000, date_format: str = '%Y-%m-%d',
+            dry_run: bool = False, start: int = 0):
+        """
+        Import raw records (see read_records) batch by batch. start is the number of
+        records already consumed from the input, for record numbers in errors. Yields one
+        dict per batch: {'records', 'imported', 'skipped', 'items'}. Each batch commits on
+        its own; invoices this import already created are skipped, so a rerun resumes.
+        """
+        shop = InvoiceGenerationService.get_shop()
+        customers = cls._existing_customers()
+        checked = set(customers)  # customer keys already validated (or already in the database)
+        seen = set()
+        number = start
+        records = iter(records)
+        while True:
+            raw = list(islice(records, batch_size))
+            if not raw:
+                return
+            batch = []
+            for record in raw:
+                number += 1
+                parsed = cls.parse(record, date_format, checked, number)
+                if parsed.invoice_no in seen:
+                    raise BulkImportError(
+                        f"Record {number}: invoice {parsed.invoice_no} appears twice "
+                        "(CSV rows of one invoice must be consecutive)."
+                    )
+                seen.add(parsed.invoice_no)
+                batch.append(parsed)
+
+            done = cls._already_imported(batch)
+            todo = [record for record in batch if record.invoice_no not in done]
+            if todo and not dry_run:
+                with transaction.atomic():
+                    reserve_invoice_numbers(record.invoice_no for record in todo)
+                    cls._write(todo, shop, customers, ChangeCounter.next_version())
+            yield {
+                'records': len(batch),
+                'imported': len(todo),
+                'skipped': len(done),
+                'items': sum(len(record.items) for record in todo),
+            }
+
+    @classmethod
+    def parse(cls, record: dict, date_format: str, checked: set, number: int) -> SimpleNamespace:
+        """
+        Validate one raw record: items go through the same checks as POST /api/orders/,
+        customers not in checked through CustomerSerializer (their keys are added to it).
+        """
+        invoice_no = str(record.get('invoice_no') or '').strip()
+        where = f"Record {number} (invoice {invoice_no or '?'})"
+        if not invoice_no or len(invoice_no) > _INVOICE_NO_MAX_LENGTH:
+            raise BulkImportError(f"{where}: invoice_no is required, at most {_INVOICE_NO_MAX_LENGTH} characters.")
+
+        def parse_date(name):
+            value = str(record.get(name) or '').strip()
+            try:
+                return datetime.datetime.strptime(value, date_format).date()
+            except ValueError:
+                raise BulkImportError(f"{where}: {name} {value!r} does not match {date_format!r}.")
+
+        invoice_date = parse_date('invoice_date')
+        order_date = parse_date('order_date') if record.get('order_date') else invoice_date
+
+        customer = record.get('customer')
+        if not isinstance(customer, dict):
+            raise BulkImportError(f"{where}: customer must be an object.")
+        key = customer_key(customer)
+        if key not in checked:
+            serializer = CustomerSerializer(data=customer)
+            if not serializer.is_valid():
+                raise BulkImportError(f"{where}: customer {_messages(serializer.errors)}")
+            customer = serializer.validated_data
+            checked.add(key)
+        else:
+            customer = {field: str(customer.get(field) or '').strip() for field in CUSTOMER_FIELDS}
+
+        raw_items = record.get('items')
+        if not isinstance(raw_items, list) or not raw_items:
+            raise BulkImportError(f"{where}: at least one item is required.")
+        items = []
+        for position, raw_item in enumerate(raw_items, start=1):
+            data = dict(raw_item) if isinstance(raw_item, dict) else {}
+            data['sno'] = _to_int(data.get('sno')) or position
+            if not data.get('hsn_sac'):
+                data.pop('hsn_sac', None)
+            if not data.get('amount'):
+                # Spreadsheets often leave the amount column to a formula
+                try:
+                    amount = Decimal(str(data.get('quantity')).strip()) * Decimal(str(data.get('rate')).strip())
+                    data['amount'] = str(amount.quantize(_PAISE, rounding=ROUND_HALF_UP))
+                except (InvalidOperation, ValueError):
+                    pass
+            item = _fast_item(data)
+            if item is None:
+                serializer = OrderItemSerializer(data=data)
+                if not serializer.is_valid():
+                    raise BulkImportError(f"{where}: item {position} {_messages(serializer.errors)}")
+                item = serializer.validated_data
+            items.append(item)
+        items.sort(key=lambda item: item['sno'])
+        if len({item['sno'] for item in items}) != len(items):
+            raise BulkImportError(f"{where}: duplicate sno.")
+        totals = cls._parse_totals(record.get('totals'), items, customer, where)
+
+        tz = timezone.get_current_timezone()
+        return SimpleNamespace(
+            invoice_no=invoice_no,
+            invoice_date=invoice_date,
+            invoice_created_at=datetime.datetime.combine(invoice_date, datetime.time(), tzinfo=tz),
+            order_date=datetime.datetime.combine(order_date, datetime.time(), tzinfo=tz),
+            customer=customer,
+            customer_key=key,
+            items=items,
+            totals=totals,
+        )
+
+    @staticmethod
+    def _parse_totals(given, items, customer: dict, where: str) -> dict:
+        """
+        ORDER_TOTAL_FIELDS for a record: computed from the items with the usual tax rules,
+        or, when the record has totals (printed under older rates or with a round-off),
+        those exactly as given. total_before_tax and total_amount are then required and
+        blank taxes are 0; the tax columns used decide is_inter_state.
+        """
+        breakdown = get_tax_breakdown(sum(item['amount'] for item in items), customer.get('state_code') or '')
+        if given is None:
+            given = {}
+        if not isinstance(given, dict):
+            raise BulkImportError(f"{where}: totals must be an object.")
+        given = {field: str(given.get(field) if given.get(field) is not None else '').strip() for field in TOTAL_FIELDS}
+        if not any(given.values()):
+            return {field: breakdown[field] for field in ORDER_TOTAL_FIELDS}
+        totals = {}
+        for field, value in given.items():
+            if not value and field not in TAX_FIELDS:
+                raise BulkImportError(f"{where}: {field} is required when totals are given.")
+            try:
+                totals[field] = _TOTAL.run_validation(value or '0')
+            except serializers.ValidationError as e:
+                raise BulkImportError(f"{where}: {field} {' '.join(str(m) for m in e.detail)}")
+        if totals['igst_amount'] or totals['cgst_amount'] or totals['sgst_amount']:
+            totals['is_inter_state'] = bool(totals['igst_amount'])
+        else:
+            totals['is_inter_state'] = breakdown['is_inter_state']
+        return totals
+
+    @staticmethod
+    def _existing_customers() -> dict:
+        """{customer_key: (pk, search text)} for every customer; first (oldest) wins."""
+        customers = {}
+        rows = Customer.objects.order_by('pk').values_list('pk', *CUSTOMER_FIELDS)
+        for pk, *values in rows.iterator(chunk_size=5000):
+            data = dict(zip(CUSTOMER_FIELDS, values))
+            customers.setdefault(customer_key(data), (pk, customer_text(SimpleNamespace(**data))))
+        return customers
+
+    @staticmethod
+    def _already_imported(batch) -> set:
+        """
+        Invoice numbers of the batch this import created before (skipped on rerun).
+        Raises BulkImportError if a number belongs to any other invoice.
+        """
+        numbers = [record.invoice_no for record in batch]
+        done = set()
+        for invoice_no, client_id in (
+            Invoice.objects.filter(invoice_no__in=numbers).values_list('invoice_no', 'order__client_id')
+        ):
+            if client_id != import_client_id(invoice_no):
+                raise BulkImportError(f"Invoice number {invoice_no} is already used by an existing invoice.")
+            done.add(invoice_no)
+        archived = ArchivedOrder.objects.filter(invoice_no__in=numbers).values_list('invoice_no', flat=True).first()
+        if archived:
+            raise BulkImportError(f"Invoice number {archived} is already used by an archived invoice.")
+        return done
+
+    @classmethod
+    def _write(cls, batch, shop, customers: dict, version: int) -> None:
+        """
+        Insert one batch: new customers, orders, items, invoices (snapshot headers and
+        lines) and search documents. bulk_create skips save() and signals, so version is set here
+        and updated_at comes from auto_now.
+        """
+        new_customers = {}
+        for record in batch:
+            if record.customer_key not in customers and record.customer_key not in new_customers:
+                new_customers[record.customer_key] = Customer(version=version, **record.customer)
+        Customer.objects.bulk_create(new_customers.values())
+        if any(customer.pk is None for customer in new_customers.values()):
+            # Backends that don't return inserted ids (MySQL): this batch's version is unique to it
+            created = Customer.objects.filter(version=version).values_list('pk', *CUSTOMER_FIELDS)
+            for pk, *values in created:
+                new_customers[customer_key(dict(zip(CUSTOMER_FIELDS, values)))].pk = pk
+        for key, customer in new_customers.items():
+            customers[key] = (customer.pk, customer_text(customer))
+
+        orders = [
+            Order(
+                customer_id=customers[record.customer_key][0],
+                client_id=import_client_id(record.invoice_no),
+                order_date=record.order_date,
+                version=version,
+                **record.totals,
+            )
+            for record in batch
+        ]
+        Order.objects.bulk_create(orders)
+        if any(order.pk is None for order in orders):
+            ids = dict(
+                Order.objects.filter(client_id__in=[order.client_id for order in orders]).values_list('client_id', 'pk')
+            )
+            for order in orders:
+                order.pk = ids[order.client_id]
+        # auto_now_add wrote "now" on insert; put the historical dates back
+        cls._set_dates(Order, [(order.pk, {'order_date': record.order_date}) for record, order in zip(batch, orders)])
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order.pk, version=version, **item)
+            for record, order in zip(batch, orders)
+            for item in record.items
+        ])
+        invoices = [
+            Invoice(
+                order_id=order.pk,
+                invoice_no=record.invoice_no,
+                invoice_date=record.invoice_date,
+                created_at=record.invoice_created_at,
+                snapshot=cls._snapshot(shop, order, record),
+                version=version,
+            )
+            for record, order in zip(batch, orders)
+        ]
+        Invoice.objects.bulk_create(invoices)
+        if any(invoice.pk is None for invoice in invoices):
+            ids = dict(
+                Invoice.objects.filter(invoice_no__in=[invoice.invoice_no for invoice in invoices])
+                .values_list('invoice_no', 'pk')
+            )
+            for invoice in invoices:
+                invoice.pk = ids[invoice.invoice_no]
+        cls._set_dates(Invoice, [
+            (invoice.pk, {'invoice_date': record.invoice_date, 'created_at': record.invoice_created_at})
+            for record, invoice in zip(batch, invoices)
+        ])
+        InvoiceLine.objects.bulk_create([
+            InvoiceLine(invoice_id=invoice.pk, **{field: item[field] for field in ITEM_FIELDS})
+            for record, invoice in zip(batch, invoices)
+            for item in record.items
+        ])
+        SearchIndex.index_many([
+            [
+                order.pk,
+                customers[record.customer_key][1],
+                record.invoice_no,
+                ' '.join(item['description'] for item in record.items),
+            ]
+            for record, order in zip(batch, orders)
+        ])
+
+    @staticmethod
+    def _set_dates(model, rows) -> None:
+        """rows: (pk, {field: date}). One UPDATE per distinct set of dates, not per row."""
+        pks_by_dates = defaultdict(list)
+        for pk, dates in rows:
+            pks_by_dates[tuple(dates.items())].append(pk)
+        for dates, pks in pks_by_dates.items():
+            model.objects.filter(pk__in=pks).update(**dict(dates))
+
+    @staticmethod
+    def _snapshot(shop, order, record) -> dict:
+        """Snapshot header with the customer details as given for this invoice, not the deduplicated row's."""
+        printed = SimpleNamespace(
+            pk=order.pk,
+            customer=SimpleNamespace(**{field: record.customer.get(field, '') for field in CUSTOMER_FIELDS}),
+            **{field: getattr(order, field) for field in ORDER_TOTAL_FIELDS},
+        )
+        return build_snapshot(shop, printed, record.invoice_no, record.invoice_date)
+
+
+def _to_int(value):
+    if isinstance(value, int):
+        return value
+    value = str(value or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def _messages(errors: dict) -> str:
+    """DRF serializer errors as 'field: message; ...'."""
+    return '; '.join(f"{field}: {' '.join(str(m) for m in messages)}" for field, messages in errors.items())
@@ -0,0 +1,351 @@
+"""
+GST filing exports: GSTR-1 (B2B, B2CL, B2CS, HSN summary) and e-invoice (IRP schema 1.1) JSON.
+
+Invoices are read once, in primary-key chunks, from their frozen snapshots (values
+as printed on the PDF) with one query for the chunk's lines; invoices from before
+snapshots existed are rebuilt in the same chunk from prefetched orders. Each invoice is classified and added to its group as it
+is read; documents are written section by section rather than built as one string.
+Archived financial years are not included.
+"""
+import datetime
+import json
+import re
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Prefetch
+
+from .models import Invoice, InvoiceLine, Order, OrderItem
+from .services import InvoiceGenerationService
+from .snapshot import ITEM_FIELDS, build_snapshot, item_row
+from .utils import IGST_RATE, CGST_RATE, SGST_RATE, SHOP_STATE_CODE
+
+EXPORT_CHUNK_SIZE = 1000
+# Inter-state invoices to unregistered buyers above this value are reported invoice-wise (B2CL)
+B2CL_LIMIT = Decimal('100000')
+# Unit quantity code reported in the HSN summary
+HSN_UQC = 'NOS'
+
+_PAISE = Decimal('0.01')
+_ZERO = Decimal('0')
+# Six-digit Indian PIN code, optionally written as 'NNN NNN'
+_PIN_RE = re.compile(r'(?<!\d)([1-9]\d{2}) ?(\d{3})(?!\d)')
+_ADDRESS_PARTS_RE = re.compile(r'[,\n]+')
+_PERIOD_RE = re.compile(r'(0[1-9]|1[0-2])\d{4}')  # GSTR-1 'fp': MMYYYY
+
+
+class GstExportError(Exception):
+    """Raised for an invalid export period, or an invoice that cannot be exported."""
+    pass
+
+
+def _num(value: Decimal) -> float:
+    """Amounts as JSON numbers with two decimals, as the GST schemas expect."""
+    return float(Decimal(value).quantize(_PAISE, rounding=ROUND_HALF_UP))
+
+
+def _pos(state_code: str) -> str:
+    return state_code.strip().zfill(2) if state_code and state_code.strip() else ''
+
+
+def _is_service(hsn_sac: str) -> bool:
+    """SAC (services accounting) codes all start with 99; HSN goods codes never do."""
+    return (hsn_sac or '').strip().startswith('99')
+
+
+def _location(address: str, state: str = ''):
+    """
+    (Loc, Pin) for e-invoice party details from a free-text address: the PIN is the last
+    six-digit number, the place the last part before it that isn't the state.
+    (None, None) if the address has no PIN.
+    """
+    address = address or ''
+    pins = list(_PIN_RE.finditer(address))
+    if not pins:
+        return None, None
+    pin = pins[-1]
+    parts = [
+        part.strip(' -.') for part in _ADDRESS_PARTS_RE.split(address[:pin.start()])
+        if any(ch.isalpha() for ch in part)
+    ]
+    if len(parts) > 1 and state and parts[-1].lower() == state.strip().lower():
+        parts.pop()
+    return (parts[-1][:50] if parts else None), int(pin.group(1) + pin.group(2))
+
+
+class _Invoice:
+    """One invoice, normalised from its snapshot."""
+    __slots__ = ('number', 'date', 'ctin', 'pos', 'inter', 'txval', 'iamt', 'camt', 'samt', 'value', 'items', 'snapshot')
+
+    def __init__(self, snapshot: dict, items):
+        totals = snapshot['totals']
+        customer = snapshot['customer']
+        self.snapshot = snapshot
+        self.number = snapshot['invoice_no']
+        self.date = datetime.date.fromisoformat(snapshot['invoice_date'])
+        self.ctin = (customer.get('gstin') or '').strip().upper()
+        self.pos = _pos(customer.get('state_code'))
+        self.inter = snapshot['is_inter_state']
+        self.txval = Decimal(totals['total_before_tax'])
+        self.iamt = Decimal(totals['igst_amount'])
+        self.camt = Decimal(totals['cgst_amount'])
+        self.samt = Decimal(totals['sgst_amount'])
+        self.value = Decimal(totals['total_amount'])
+        self.items = items  # rows in ITEM_FIELDS order
+
+    @property
+    def rate(self) -> Decimal:
+        return IGST_RATE if self.inter else CGST_RATE + SGST_RATE
+
+    def item_taxes(self, amount: Decimal):
+        """(igst, cgst, sgst) on one line at this invoice's rate."""
+        if self.inter:
+            return (amount * IGST_RATE / 100).quantize(_PAISE, rounding=ROUND_HALF_UP), _ZERO, _ZERO
+        cgst = (amount * CGST_RATE / 100).quantize(_PAISE, rounding=ROUND_HALF_UP)
+        sgst = (amount * SGST_RATE / 100).quantize(_PAISE, rounding=ROUND_HALF_UP)
+        return _ZERO, cgst, sgst
+
+    def lines(self) -> list:
+        """
+        [item, taxable, igst, cgst, sgst] per line, taxes at this invoice's rate. Per-line
+        rounding differences go to the largest line, so the lines add up to the invoice totals.
+        """
+        lines = []
+        for row in self.items:
+            item = dict(zip(ITEM_FIELDS, row))
+            amount = Decimal(item['amount'])
+            lines.append([item, amount, *self.item_taxes(amount)])
+        if lines:
+            largest = max(lines, key=lambda line: line[1])
+            for i, total in enumerate((self.txval, self.iamt, self.camt, self.samt), start=1):
+                largest[i] += total - sum(line[i] for line in lines)
+        return lines
+
+    def gstr1_items(self) -> list:
+        # Single GST rate per invoice, so one rate line carrying the invoice totals
+        return [{
+            'num': 1,
+            'itm_det': {
+                'txval': _num(self.txval), 'rt': _num(self.rate),
+                'iamt': _num(self.iamt), 'camt': _num(self.camt), 'samt': _num(self.samt), 'csamt': 0,
+            },
+        }]
+
+
+def iter_invoices(start: datetime.date, end: datetime.date, chunk_size: int = EXPORT_CHUNK_SIZE, items: bool = True):
+    """Yield _Invoice for every invoice dated start..end (inclusive), in id order; items=False skips the lines."""
+    if start > end:
+        raise GstExportError("Export period start is after its end.")
+    invoices = (
+        Invoice.objects
+        .filter(invoice_date__gte=start, invoice_date__lte=end)
+        .order_by('pk')
+        .values_list('pk', 'order_id', 'invoice_no', 'invoice_date', 'snapshot', named=True)
+    )
+    shop = None
+    last_pk = 0
+    while True:
+        chunk = list(invoices.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        last_pk = chunk[-1].pk
+        lines = defaultdict(list)
+        current = [row.pk for row in chunk if row.snapshot and 'items' not in row.snapshot]
+        if current and items:
+            for invoice_id, *row in (
+                InvoiceLine.objects.filter(invoice_id__in=current)
+                .order_by('invoice_id', 'sno').values_list('invoice_id', *ITEM_FIELDS)
+            ):
+                lines[invoice_id].append(row)
+        legacy = [row.order_id for row in chunk if not row.snapshot]
+        orders = {}
+        if legacy:
+            shop = shop or InvoiceGenerationService.get_shop()
+            orders = Order.objects.select_related('customer')
+            if items:
+                orders = orders.prefetch_related(Prefetch('items', queryset=OrderItem.objects.order_by('sno')))
+            orders = orders.in_bulk(legacy)
+        for row in chunk:
+            snapshot = row.snapshot
+            if not snapshot:
+                order = orders[row.order_id]
+                snapshot = build_snapshot(shop, order, row.invoice_no, row.invoice_date)
+                rows = [item_row(item) for item in order.items.all()] if items else ()
+            else:
+                # v1 snapshots carry their items inline
+                rows = snapshot.get('items') or lines.pop(row.pk, ())
+            yield _Invoice(snapshot, rows)
+
+
+class Gstr1Builder:
+    """Groups invoices into GSTR-1 sections as they arrive; iter_json() emits the JSON document."""
+
+    def __init__(self, gstin: str, period: str):
+        self.gstin = gstin
+        self.period = period  # 'MMYYYY'
+        self.b2b = defaultdict(list)   # ctin → invoice entries
+        self.b2cl = defaultdict(list)  # pos → invoice entries
+        self.b2cs = defaultdict(lambda: [_ZERO, _ZERO, _ZERO, _ZERO])  # (sply_ty, pos, rt) → txval, iamt, camt, samt
+        self.hsn = defaultdict(lambda: [_ZERO] * 6)  # (hsn, rt) → qty, val, txval, iamt, camt, samt
+        self.stats = {'invoices': 0, 'b2b': 0, 'b2cl': 0, 'b2cs': 0, 'missing_pos': 0}
+
+    def add(self, invoice: _Invoice) -> None:
+        self.stats['invoices'] += 1
+        if not invoice.pos:
+            self.stats['missing_pos'] += 1
+        entry = {
+            'inum': invoice.number,
+            'idt': invoice.date.strftime('%d-%m-%Y'),
+            'val': _num(invoice.value),
+        }
+        if invoice.ctin:
+            self.stats['b2b'] += 1
+            self.b2b[invoice.ctin].append({
+                **entry, 'pos': invoice.pos, 'rchrg': 'N', 'inv_typ': 'R', 'itms': invoice.gstr1_items(),
+            })
+        elif invoice.inter and invoice.value > B2CL_LIMIT:
+            self.stats['b2cl'] += 1
+            self.b2cl[invoice.pos].append({**entry, 'itms': invoice.gstr1_items()})
+        else:
+            self.stats['b2cs'] += 1
+            group = self.b2cs['INTER' if invoice.inter else 'INTRA', invoice.pos, invoice.rate]
+            group[0] += invoice.txval
+            group[1] += invoice.iamt
+            group[2] += invoice.camt
+            group[3] += invoice.samt
+
+        rate = invoice.rate
+        for item, amount, iamt, camt, samt in invoice.lines():
+            totals = self.hsn[item['hsn_sac'], rate]
+            totals[0] += Decimal(item['quantity'])
+            totals[1] += amount + iamt + camt + samt
+            totals[2] += amount
+            totals[3] += iamt
+            totals[4] += camt
+            totals[5] += samt
+
+    def iter_json(self):
+        """The GSTR-1 JSON document as text chunks, one group at a time."""
+        yield '{"gstin": %s, "fp": %s, "b2b": [' % (json.dumps(self.gstin), json.dumps(self.period))
+        for i, (ctin, invoices) in enumerate(sorted(self.b2b.items())):
+            yield (', ' if i else '') + json.dumps({'ctin': ctin, 'inv': invoices})
+        yield '], "b2cl": ['
+        for i, (pos, invoices) in enumerate(sorted(self.b2cl.items())):
+            yield (', ' if i else '') + json.dumps({'pos': pos, 'inv': invoices})
+        yield '], "b2cs": ' + json.dumps([
+            {
+                'sply_ty': sply_ty, 'pos': pos, 'typ': 'OE', 'rt': _num(rate),
+                'txval': _num(t[0]), 'iamt': _num(t[1]), 'camt': _num(t[2]), 'samt': _num(t[3]), 'csamt': 0,
+            }
+            for (sply_ty, pos, rate), t in sorted(self.b2cs.items())
+        ])
+        yield ', "hsn": ' + json.dumps({'data': [
+            {
+                'num': num, 'hsn_sc': hsn, 'desc': '', 'uqc': HSN_UQC, 'rt': _num(rate),
+                'qty': _num(t[0]), 'val': _num(t[1]), 'txval': _num(t[2]),
+                'iamt': _num(t[3]), 'camt': _num(t[4]), 'samt': _num(t[5]), 'csamt': 0,
+            }
+            for num, ((hsn, rate), t) in enumerate(sorted(self.hsn.items()), start=1)
+        ]}) + '}'
+
+
+def einvoice_parties(invoice: _Invoice) -> tuple:
+    """
+    (SellerDtls, BuyerDtls) for the invoice. Loc and Pin are mandatory, so an address
+    without a PIN code raises GstExportError naming the invoice.
+    """
+    shop = invoice.snapshot['shop']
+    customer = invoice.snapshot['customer']
+    seller_loc, seller_pin = _location(shop['address'], shop.get('state', ''))
+    buyer_loc, buyer_pin = _location(customer.get('address'))
+    for party, loc, pin in (('shop', seller_loc, seller_pin), ('customer', buyer_loc, buyer_pin)):
+        if pin is None or loc is None:
+            raise GstExportError(
+                f"Invoice {invoice.number}: the {party} address needs a place and a 6-digit PIN code "
+                f"for e-invoicing (e.g. '..., Vijayawada 520001')."
+            )
+    seller = {
+        'Gstin': shop['gstin'], 'LglNm': shop['name'], 'Addr1': shop['address'][:100],
+        'Loc': seller_loc, 'Pin': seller_pin, 'Stcd': _pos(shop['state_code']) or SHOP_STATE_CODE,
+    }
+    buyer = {
+        'Gstin': invoice.ctin, 'LglNm': customer['name'], 'Pos': invoice.pos,
+        'Addr1': (customer.get('address') or '')[:100], 'Loc': buyer_loc, 'Pin': buyer_pin, 'Stcd': invoice.pos,
+    }
+    return seller, buyer
+
+
+def einvoice_payload(invoice: _Invoice) -> dict:
+    """IRP e-invoice JSON (schema 1.1) for one B2B invoice."""
+    seller, buyer = einvoice_parties(invoice)
+    items = []
+    for item, amount, iamt, camt, samt in invoice.lines():
+        items.append({
+            'SlNo': str(item['sno']),
+            'PrdDesc': item['description'],
+            'IsServc': 'Y' if _is_service(item['hsn_sac']) else 'N',
+            'HsnCd': item['hsn_sac'],
+            'Qty': _num(Decimal(item['quantity'])),
+            'Unit': HSN_UQC,
+            'UnitPrice': _num(Decimal(item['rate'])),
+            'TotAmt': _num(amount),
+            'AssAmt': _num(amount),
+            'GstRt': _num(invoice.rate),
+            'IgstAmt': _num(iamt),
+            'CgstAmt': _num(camt),
+            'SgstAmt': _num(samt),
+            'TotItemVal': _num(amount + iamt + camt + samt),
+        })
+    return {
+        'Version': '1.1',
+        'TranDtls': {'TaxSch': 'GST', 'SupTyp': 'B2B'},
+        'DocDtls': {'Typ': 'INV', 'No': invoice.number, 'Dt': invoice.date.strftime('%d/%m/%Y')},
+        'SellerDtls': seller,
+        'BuyerDtls': buyer,
+        'ItemList': items,
+        'ValDtls': {
+            'AssVal': _num(invoice.txval),
+            'CgstVal': _num(invoice.camt),
+            'SgstVal': _num(invoice.samt),
+            'IgstVal': _num(invoice.iamt),
+            'TotInvVal': _num(invoice.value),
+        },
+    }
+
+
+class GstExportService:
+    """Service layer for GST filing exports."""
+
+    @staticmethod
+    def gstr1(start: datetime.date, end: datetime.date, period: str = None) -> Gstr1Builder:
+        """GSTR-1 sections for invoices dated start..end; period ('MMYYYY') defaults to end's month."""
+        period = period or end.strftime('%m%Y')
+        if not _PERIOD_RE.fullmatch(period):
+            raise GstExportError(f"Invalid return period {period!r}; use MMYYYY.")
+        builder = Gstr1Builder(InvoiceGenerationService.get_shop().gstin, period)
+        for invoice in iter_invoices(start, end):
+            builder.add(invoice)
+        return builder
+
+    @staticmethod
+    def check_einvoices(start: datetime.date, end: datetime.date) -> None:
+        """
+        Raise GstExportError for the first B2B invoice in the period that can't be
+        e-invoiced (e.g. no PIN code in an address). Reads headers only; call it before
+        streaming iter_einvoices_json so the error isn't hit halfway through the output.
+        """
+        for invoice in iter_invoices(start, end, items=False):
+            if invoice.ctin:
+                einvoice_parties(invoice)
+
+    @staticmethod
+    def iter_einvoices_json(start: datetime.date, end: datetime.date):
+        """JSON array of e-invoice payloads for the period's B2B invoices, as text chunks."""
+        yield '['
+        first = True
+        for invoice in iter_invoices(start, end):
+            if not invoice.ctin:
+                continue
+            yield ('' if first else ',\n') + json.dumps(einvoice_payload(invoice))
+            first = False
+        yield ']'
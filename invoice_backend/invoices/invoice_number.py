@@ -1,35 +1,64 @@
 """
 Auto-increment invoice number: SP-YYYY-XXXX (e.g. SP-2026-0001).
-Uses database with transaction to prevent duplicates.
+Numbers come from a per-prefix counter row (InvoiceSequence) bumped inside the caller's
+transaction, so two invoices never get the same number and none is skipped.
 """
+import re
+
 from django.db import transaction
+from django.db.models.functions import Length
 from django.utils import timezone
 
-from .models import Invoice
+from .models import Invoice, ArchivedOrder, InvoiceSequence
 
+# PREFIX-YYYY-<sequence>
+_NUMBER_RE = re.compile(r'^(.+-\d{4}-)(\d+)$')
 
-def get_next_invoice_number(prefix: str = 'SP') -> str:
+
+def _last_issued(prefix_with_year: str) -> int:
     """
-    Returns next invoice number in form PREFIX-YYYY-XXXX.
-    Uses select_for_update to avoid race conditions.
+    Highest sequence already used under the prefix, in live or archived invoices
+    (a financial year can be archived while its calendar year's sequence is in use).
     """
-    year = timezone.now().year
-    prefix_with_year = f"{prefix}-{year}-"
-
-    with transaction.atomic():
-        last = (
-            Invoice.objects
+    last = 0
+    for model in (Invoice, ArchivedOrder):
+        number = (
+            model.objects
             .filter(invoice_no__startswith=prefix_with_year)
-            .order_by('-invoice_no')
+            # Longest first: '...-10000' sorts before '...-9999' as text
+            .order_by(Length('invoice_no').desc(), '-invoice_no')
             .values_list('invoice_no', flat=True)
             .first()
         )
-        if last:
-            try:
-                seq = int(last.split('-')[-1])
-            except (ValueError, IndexError):
-                seq = 0
-        else:
-            seq = 0
-        next_seq = seq + 1
-        return f"{prefix_with_year}{next_seq:04d}"
+        match = _NUMBER_RE.match(number or '')
+        if match and match.group(1) == prefix_with_year:
+            last = max(last, int(match.group(2)))
+    return last
+
+
+def get_next_invoice_number(prefix: str = 'SP') -> str:
+    """
+    Returns next invoice number in form PREFIX-YYYY-XXXX.
+    The counter row stays locked until the caller's transaction commits, so concurrent
+    allocations wait for it instead of racing; a rolled-back invoice returns its number.
+    """
+    prefix_with_year = f"{prefix}-{timezone.now().year}-"
+    with transaction.atomic():
+        seq = InvoiceSequence.next_number(prefix_with_year, seed=lambda: _last_issued(prefix_with_year))
+    return f"{prefix_with_year}{seq:04d}"
+
+
+def reserve_invoice_numbers(invoice_numbers) -> None:
+    """
+    Advance the counters past invoice numbers written without get_next_invoice_number
+    (bulk imports), so new invoices don't collide with them. Call in the writing
+    transaction, before its ChangeCounter version, to lock in the same order as invoicing.
+    """
+    highest = {}
+    for invoice_no in invoice_numbers:
+        match = _NUMBER_RE.match(invoice_no)
+        if match:
+            prefix, seq = match.group(1), int(match.group(2))
+            highest[prefix] = max(highest.get(prefix, 0), seq)
+    for prefix, seq in sorted(highest.items()):
+        InvoiceSequence.advance(prefix, seq, seed=lambda: _last_issued(prefix))
@@ -0,0 +1,33 @@
+"""
+Move a closed financial year's orders, items and invoices into the archive.
+Usage: python manage.py archive_year 2024   # FY 2024-25 (1 Apr 2024 – 31 Mar 2025)
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from invoices.archive import ArchiveService, ArchiveError, financial_year_label
+
+
+class Command(BaseCommand):
+    help = "Archive orders, items and invoices of a closed financial year and pack their PDFs into one zip."
+
+    def add_arguments(self, parser):
+        parser.add_argument('financial_year', type=int, help='Starting year of the FY, e.g. 2024 for FY 2024-25.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived.')
+
+    def handle(self, *args, **options):
+        fy = options['financial_year']
+        try:
+            stats = ArchiveService.archive_financial_year(
+                fy,
+                batch_size=max(1, options['batch_size']),
+                dry_run=options['dry_run'],
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e))
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {financial_year_label(fy)}: {stats['orders']} orders, {stats['items']} items, "
+            f"{stats['invoices']} invoices, {stats['pdfs']} PDFs"
+            + ('' if options['dry_run'] else f" → {ArchiveService.pack_name(fy)}")
+        ))
@@ -0,0 +1,203 @@
+"""
+Load test for PDF downloads by slow clients: how many downloads one process keeps going
+at once behind the WSGI entry point (a thread per request; --threads as in gunicorn's
+sync/gthread workers) and behind config.asgi (one event loop, async views).
+
+The handlers are called in-process, each in a fresh subprocess so the URLconf matches
+the entry point. Every client reads at --rate KB/s, as if the response didn't fit in
+the socket buffer (large PDFs, no buffering proxy). Needs an invoice with a PDF in the
+database: --order-id, or the latest one.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from invoices.models import Invoice
+
+HEADER = f"{'mode':>5} {'clients':>8} {'at once':>8} {'wall s':>8} {'TTFB p50':>9} {'TTFB p95':>9} {'done p95':>9}"
+
+
+class _Stats:
+    """Per-client timings (seconds since the client connected) and peak concurrent downloads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = self.peak = 0
+        self.ttfb, self.done, self.sizes, self.statuses = [], [], [], []
+
+    def start_body(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def finish(self, status, size, ttfb, done, streaming):
+        with self._lock:
+            if streaming:
+                self.active -= 1
+            self.statuses.append(status)
+            self.sizes.append(size)
+            self.ttfb.append(ttfb)
+            self.done.append(done)
+
+
+def _pct(values, p) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _host() -> str:
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _wsgi_client(app, path, rate, stats, connected):
+    environ = {'PATH_INFO': path, 'HTTP_HOST': _host(), 'wsgi.input': BytesIO()}
+    setup_testing_defaults(environ)
+    status = []
+    result = app(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+    size, ttfb = 0, None
+    try:
+        for chunk in result:
+            if not chunk:
+                continue
+            if ttfb is None:
+                ttfb = time.perf_counter() - connected
+                stats.start_body()
+            size += len(chunk)
+            time.sleep(len(chunk) / rate)
+    finally:
+        result.close()
+    done = time.perf_counter() - connected
+    stats.finish(status[0], size, ttfb or done, done, ttfb is not None)
+
+
+async def _asgi_client(app, path, rate, stats):
+    connected = time.perf_counter()
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', _host().encode())], 'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 80),
+    }
+    finished = asyncio.Event()
+    requested = False
+    status, size, ttfb = [], 0, None
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal size, ttfb
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            if ttfb is None:
+                ttfb = time.perf_counter() - connected
+                stats.start_body()
+            size += len(message['body'])
+            await asyncio.sleep(len(message['body']) / rate)
+
+    await app(scope, receive, send)
+    finished.set()
+    done = time.perf_counter() - connected
+    stats.finish(status[0], size, ttfb or done, done, ttfb is not None)
+
+
+def _run_wsgi(path, clients, rate, threads) -> _Stats:
+    from config.wsgi import application
+    stats = _Stats()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [
+            pool.submit(_wsgi_client, application, path, rate, stats, time.perf_counter())
+            for _ in range(clients)
+        ]
+        for future in futures:
+            future.result()
+    return stats
+
+
+def _run_asgi(path, clients, rate) -> _Stats:
+    from config.asgi import application
+    stats = _Stats()
+
+    async def main():
+        await asyncio.gather(*(_asgi_client(application, path, rate, stats) for _ in range(clients)))
+
+    asyncio.run(main())
+    return stats
+
+
+class Command(BaseCommand):
+    help = "Compare concurrent slow PDF downloads served through WSGI and ASGI in one process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', default='1,10,50', help='Comma-separated concurrent client counts.')
+        parser.add_argument('--rate', type=float, default=32, help='Client download speed, KB/s.')
+        parser.add_argument('--threads', type=int, default=1, help='WSGI threads per process (the Procfile runs 1).')
+        parser.add_argument('--order-id', type=int, help='Order whose invoice PDF is downloaded (default: latest).')
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both',
+                            help="'wsgi'/'asgi' run one entry point in this process (used by 'both').")
+
+    def handle(self, *args, **options):
+        invoices = Invoice.objects.exclude(pdf_file='').defer('snapshot')
+        if options['order_id']:
+            invoices = invoices.filter(order_id=options['order_id'])
+        invoice = invoices.order_by('-pk').first()
+        if not invoice:
+            raise CommandError("No generated invoice with a PDF; generate one first or pass --order-id.")
+
+        if options['mode'] == 'both':
+            self.stdout.write(f"invoice {invoice.invoice_no}: {invoice.pdf_file.size / 1024:.1f} KB "
+                              f"at {options['rate']:g} KB/s per client, WSGI threads={options['threads']}")
+            self.stdout.write(HEADER)
+            for mode in ('wsgi', 'asgi'):
+                self._run_child(mode, invoice.order_id, options)
+            return
+
+        if settings.ASYNC_VIEWS != (options['mode'] == 'asgi'):
+            raise CommandError(f"--mode {options['mode']} needs ASYNC_VIEWS={int(options['mode'] == 'asgi')}.")
+        path = f'/api/invoice/{invoice.order_id}/pdf/'
+        rate = options['rate'] * 1024
+        expected = invoice.pdf_file.size
+        for clients in [int(c) for c in options['clients'].split(',') if c.strip()]:
+            started = time.perf_counter()
+            if options['mode'] == 'asgi':
+                stats = _run_asgi(path, clients, rate)
+            else:
+                stats = _run_wsgi(path, clients, rate, options['threads'])
+            wall = time.perf_counter() - started
+            if set(stats.statuses) != {200} or set(stats.sizes) != {expected}:
+                raise CommandError(f"{options['mode']}: unexpected responses {set(stats.statuses)} / sizes {set(stats.sizes)}")
+            self.stdout.write(
+                f"{options['mode']:>5} {clients:>8} {stats.peak:>8} {wall:>8.2f} "
+                f"{_pct(stats.ttfb, 0.5):>9.3f} {_pct(stats.ttfb, 0.95):>9.3f} {_pct(stats.done, 0.95):>9.3f}"
+            )
+
+    def _run_child(self, mode, order_id, options):
+        env = dict(os.environ, ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        result = subprocess.run(
+            [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_downloads', '--mode', mode,
+                '--order-id', str(order_id), '--clients', options['clients'],
+                '--rate', str(options['rate']), '--threads', str(options['threads']),
+            ],
+            env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"{mode} run failed:\n{result.stderr}")
+        self.stdout.write(result.stdout.rstrip())
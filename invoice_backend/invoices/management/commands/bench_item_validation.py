@@ -0,0 +1,78 @@
+"""
+Benchmark for order item validation: the single-pass fast path (OrderItemSerializer(many=True))
+against plain DRF ListSerializer validation, on synthetic orders of increasing size.
+Also checks that both produce the same validated data and the same errors. No database access.
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+
+from invoices.serializers import OrderItemSerializer
+
+
+def _payload(count: int) -> list:
+    """Items as the billing screen sends them (JSON numbers, rate rounded to paise)."""
+    items = []
+    for sno in range(1, count + 1):
+        quantity = sno % 7 + 1
+        amount = Decimal(1234 + sno * 17) / 10
+        items.append({
+            'sno': sno,
+            'description': f"Asian Paints Apex Ultima 20L shade {sno}",
+            'hsn_sac': '3208',
+            'quantity': quantity,
+            'rate': float((amount / quantity).quantize(Decimal('0.01'))),
+            'amount': float(amount),
+        })
+    return items
+
+
+def _validate(serializer, items):
+    try:
+        return serializer.run_validation(items), None
+    except serializers.ValidationError as e:
+        return None, e.detail
+
+
+class Command(BaseCommand):
+    help = "Compare fast-path and DRF validation time for order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000', help='Comma-separated item counts.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        repeat = max(1, options['repeat'])
+        fast = OrderItemSerializer(many=True)
+        drf = serializers.ListSerializer(child=OrderItemSerializer())
+
+        # Same output for valid input, and for input with every kind of error
+        items = _payload(50)
+        broken = _payload(6)
+        broken[0]['quantity'] = 'abc'
+        broken[1]['amount'] = broken[1]['amount'] + 5
+        broken[2]['description'] = '  '
+        broken[3]['rate'] = '1.234'
+        del broken[4]['sno']
+        broken[5] = 'not an item'
+        for payload in (items, broken):
+            if _validate(fast, payload) != _validate(drf, payload):
+                raise CommandError("Fast path and DRF validation disagree.")
+
+        self.stdout.write(f"{'items':>8} {'DRF ms':>9} {'fast ms':>9} {'speedup':>8}")
+        for count in sizes:
+            items = _payload(count)
+            timings = []
+            for serializer in (drf, fast):
+                best = float('inf')
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    serializer.run_validation(items)
+                    best = min(best, time.perf_counter() - started)
+                timings.append(best)
+            self.stdout.write(
+                f"{count:>8} {timings[0] * 1000:>9.2f} {timings[1] * 1000:>9.2f} {timings[0] / timings[1]:>7.1f}x"
+            )
@@ -0,0 +1,87 @@
+"""
+Benchmark for API response encoding: DRF's JSONRenderer against config.renderers.FastJSONRenderer
+on invoice-list payloads, and bytes on the wire raw / gzip / brotli. No database access.
+"""
+import datetime
+import gzip
+import json
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from config.compression import brotli
+from config.renderers import FastJSONRenderer, orjson
+
+
+def _rows(count: int) -> list:
+    """Rows shaped like the sync/search invoice lists: Decimal-heavy, with dates and datetimes."""
+    base = datetime.datetime(2026, 4, 1, 10, 30, tzinfo=datetime.timezone.utc)
+    rows = []
+    for i in range(1, count + 1):
+        total = Decimal(1000 + i * 37) / 4
+        tax = (total * Decimal('0.09')).quantize(Decimal('0.01'))
+        rows.append({
+            'id': i,
+            'version': 1000 + i,
+            'invoice_no': f"SP-2026-{i:04d}",
+            'invoice_date': base.date() + datetime.timedelta(days=i % 365),
+            'customer': f"Customer {i % 500}",
+            'phone': f"98{i:08d}",
+            'order_date': base + datetime.timedelta(minutes=i),
+            'total_before_tax': total.quantize(Decimal('0.01')),
+            'cgst_amount': tax,
+            'sgst_amount': tax,
+            'igst_amount': Decimal('0.00'),
+            'total_amount': (total + tax * 2).quantize(Decimal('0.01')),
+            'is_inter_state': False,
+        })
+    return rows
+
+
+def _best(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Compare JSON encoding time and compressed response sizes for invoice lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated row counts.')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        repeat = max(1, options['repeat'])
+        drf, fast = JSONRenderer(), FastJSONRenderer()
+        self.stdout.write(
+            f"orjson: {orjson.__version__ if orjson else 'not installed'}, "
+            f"brotli: {'installed' if brotli else 'not installed'}"
+        )
+        self.stdout.write(
+            f"{'rows':>7} {'DRF ms':>8} {'fast ms':>8} {'speedup':>8} {'raw KB':>8} {'gzip KB':>8} {'br KB':>8}"
+        )
+        sample = {'results': _rows(50)}
+        if json.loads(drf.render(sample)) != json.loads(fast.render(sample)):
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer.")
+        for count in sizes:
+            data = {'results': _rows(count)}
+            drf_s = _best(lambda: drf.render(data), repeat)
+            fast_s = _best(lambda: fast.render(data), repeat)
+            body = fast.render(data)
+            gzipped = len(gzip.compress(body, compresslevel=6))
+            br = (
+                f"{len(brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)) / 1024:>8.1f}"
+                if brotli else f"{'-':>8}"
+            )
+            self.stdout.write(
+                f"{count:>7} {drf_s * 1000:>8.2f} {fast_s * 1000:>8.2f} {drf_s / fast_s:>7.1f}x "
+                f"{len(body) / 1024:>8.1f} {gzipped / 1024:>8.1f} {br}"
+            )
@@ -0,0 +1,55 @@
+"""
+Memory benchmark for invoice PDF rendering: peak Python allocations (tracemalloc)
+while rendering synthetic orders of increasing size into a temp file. No database access.
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from invoices.pdf_generator import build_invoice_pdf, prewarm
+
+
+def _fake_items(count: int):
+    """Generator, like the DB iterator used by generate_for_order."""
+    for sno in range(1, count + 1):
+        yield SimpleNamespace(
+            sno=sno, description=f"Asian Paints Apex Ultima 20L shade {sno}", hsn_sac='3208',
+            quantity=Decimal('2.00'), rate=Decimal('4150.00'), amount=Decimal('8300.00'),
+        )
+
+
+class Command(BaseCommand):
+    help = "Report peak memory and time of build_invoice_pdf for orders of increasing size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000,5000', help='Comma-separated line-item counts.')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        shop = SimpleNamespace(
+            name='SAI PAINTS', gstin='37PEFPS6526R1Z6', address='GUNTAKAL', cell='8639034294',
+            state='A.P.', state_code='37', bank_name='STATE BANK OF INDIA',
+            bank_account_no='44758266961', bank_ifsc='SBIN0013021',
+        )
+        prewarm()  # keep one-off import/font costs out of the first measurement
+        self.stdout.write(f"{'items':>8} {'peak MB':>8} {'seconds':>8} {'PDF KB':>8}")
+        for count in sizes:
+            order = SimpleNamespace(
+                customer=SimpleNamespace(name='Bench', address='', phone='', gstin=''),
+                total_before_tax=Decimal('8300.00') * count, cgst_amount=Decimal('0'),
+                sgst_amount=Decimal('0'), igst_amount=Decimal('0'), total_amount=Decimal('8300.00') * count,
+            )
+            with tempfile.TemporaryFile() as out:
+                tracemalloc.start()
+                started = time.perf_counter()
+                build_invoice_pdf(shop, order, 'SP-BENCH-0001', '2026-01-01', 'Bench', items=_fake_items(count), output=out)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                size = os.fstat(out.fileno()).st_size
+            self.stdout.write(f"{count:>8} {peak / 1e6:>8.2f} {elapsed:>8.2f} {size / 1024:>8.1f}")
@@ -0,0 +1,79 @@
+"""
+Size benchmark and budget check for invoice PDFs: bytes of the stored pdf_file for 1-,
+20- and 200-line orders, rendered plain, compact, and compact + linearized (needs pikepdf).
+Exits with an error when a compact PDF is over its budget, so a layout or library change
+that bloats every stored and emailed invoice is caught. No database access.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoices.pdf_generator import build_invoice_pdf, pikepdf, prewarm
+
+# Bytes allowed per compact invoice by line count (measured without pikepdf, plus ~3%)
+SIZE_BUDGETS = {1: 2700, 20: 3900, 200: 12900}
+
+
+def _shop():
+    return SimpleNamespace(
+        name='SAI PAINTS', gstin='37PEFPS6526R1Z6', address='Main Road, GUNTAKAL - 515801', cell='8639034294',
+        state='A.P.', state_code='37', bank_name='STATE BANK OF INDIA',
+        bank_account_no='44758266961', bank_ifsc='SBIN0013021',
+    )
+
+
+def _order(count: int):
+    total = Decimal('8300.00') * count
+    tax = total * Decimal('0.09')
+    return SimpleNamespace(
+        customer=SimpleNamespace(name='Ravi Kumar', address='Station Road, Guntakal', phone='9848012345', gstin=''),
+        total_before_tax=total, cgst_amount=tax, sgst_amount=tax, igst_amount=Decimal('0.00'), total_amount=total + 2 * tax,
+    )
+
+
+def _items(count: int):
+    for sno in range(1, count + 1):
+        yield SimpleNamespace(
+            sno=sno, description=f"Asian Paints Apex Ultima 20L shade {sno}", hsn_sac='3208',
+            quantity=Decimal('2.00'), rate=Decimal('4150.00'), amount=Decimal('8300.00'),
+        )
+
+
+def _stored_size(count: int, **options) -> int:
+    """Size of the file render_pdf would store for a count-line order."""
+    with tempfile.TemporaryFile() as out:
+        build_invoice_pdf(
+            _shop(), _order(count), 'SP-2026-0001', '2026-04-01', 'Rupees Only',
+            items=_items(count), output=out, **options,
+        )
+        return os.fstat(out.fileno()).st_size
+
+
+class Command(BaseCommand):
+    help = "Report stored invoice PDF size per order size and check compact output against its budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(map(str, SIZE_BUDGETS)), help='Comma-separated line-item counts.')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        prewarm()
+        self.stdout.write(f"pikepdf: {'installed' if pikepdf else 'not installed (no object streams or linearization)'}")
+        self.stdout.write(f"{'items':>6} {'plain B':>9} {'compact B':>10} {'saved':>6} {'linear B':>9} {'budget B':>9}")
+        over = []
+        for count in sizes:
+            plain = _stored_size(count)
+            compact = _stored_size(count, compact=True)
+            linear = _stored_size(count, compact=True, linearize=True) if pikepdf else None
+            budget = SIZE_BUDGETS.get(count)
+            if budget and compact > budget:
+                over.append(f"{count} items: {compact} B > {budget} B")
+            self.stdout.write(
+                f"{count:>6} {plain:>9} {compact:>10} {1 - compact / plain:>6.0%} "
+                f"{linear if linear else '-':>9} {budget or '-':>9}"
+            )
+        if over:
+            raise CommandError("Compact PDF over budget: " + "; ".join(over))
@@ -0,0 +1,83 @@
+"""
+Startup benchmark: run `python -X importtime` on cold interpreters and report
+import cost for manage.py-style startup and for a worker serving its first request.
+"""
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Scenario name → code run in a fresh interpreter (cwd = project root)
+SCENARIOS = {
+    # What `migrate`/`check` pay: settings, apps and URLconf (views, services)
+    'manage': (
+        "import django; django.setup(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+    # What a worker pays on its first invoice: the above plus reportlab
+    'first_invoice': (
+        "import django; django.setup(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns; "
+        "from invoices.pdf_generator import prewarm; prewarm()"
+    ),
+}
+
+WATCHED_PACKAGES = ('reportlab', 'rest_framework', 'django')
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Sum cumulative microseconds of top-level imports, plus per watched package
+    (counted where the package is first entered, wherever it is nested).
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|', 2)
+        name = module.strip()
+        depth = (len(module) - len(module.lstrip(' ')) - 1) // 2
+        entries.append((depth, int(cumulative), name.split('.')[0]))
+
+    total = 0
+    packages = {name: 0 for name in WATCHED_PACKAGES}
+    stack = []  # (depth, root) of enclosing imports; output is post-order, so walk it reversed
+    for depth, cumulative, root in reversed(entries):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        parent_root = stack[-1][1] if stack else None
+        if depth == 0:
+            total += cumulative
+        if root in packages and parent_root != root:
+            packages[root] += cumulative
+        stack.append((depth, root))
+    return {'total': total, **packages}
+
+
+class Command(BaseCommand):
+    help = "Measure cold-start import time (python -X importtime) for manage.py and first-invoice startup."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per scenario; median is reported.')
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append', help='Limit to scenario(s).')
+
+    def handle(self, *args, **options):
+        names = options['scenario'] or list(SCENARIOS)
+        for name in names:
+            runs = []
+            for _ in range(max(1, options['repeat'])):
+                proc = subprocess.run(
+                    [sys.executable, '-X', 'importtime', '-c', SCENARIOS[name]],
+                    cwd=settings.BASE_DIR,
+                    capture_output=True,
+                    text=True,
+                )
+                if proc.returncode != 0:
+                    self.stderr.write(proc.stderr[-2000:])
+                    raise CommandError(f"Scenario {name} failed.")
+                runs.append(parse_importtime(proc.stderr))
+            median = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+            details = ', '.join(f"{pkg}={median[pkg] / 1000:.1f}ms" for pkg in WATCHED_PACKAGES)
+            self.stdout.write(f"{name}: total imports {median['total'] / 1000:.1f}ms ({details})")
@@ -0,0 +1,103 @@
+"""
+Check that streaming endpoints really stream under config.asgi: each response must arrive
+in several body messages, and Django must not warn that it had to read a synchronous
+iterator whole into memory first ("StreamingHttpResponse must consume synchronous
+iterators..."), which is what happens to a sync streaming view behind ASGI.
+
+The application is called in-process, in a subprocess with ASYNC_VIEWS=1 so the URLconf
+matches the ASGI entry point. The PDF download is checked too if an invoice has a PDF.
+CI runs it on every backend push.
+"""
+import asyncio
+import datetime
+import os
+import subprocess
+import sys
+import warnings
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from invoices.models import Invoice
+
+from .bench_downloads import _host
+
+
+async def _get(app, path: str, query: str = '') -> tuple:
+    """(status, non-empty body messages) for a GET through the ASGI application."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', _host().encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 80),
+    }
+    finished = asyncio.Event()
+    requested = False
+    status, bodies = [], []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            bodies.append(message['body'])
+
+    await app(scope, receive, send)
+    finished.set()
+    return status[0], bodies
+
+
+class Command(BaseCommand):
+    help = "Fail if a streaming endpoint is buffered in memory when served through config.asgi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--child', action='store_true', help='Run the checks in this process (needs ASYNC_VIEWS=1).')
+
+    def handle(self, *args, **options):
+        if not options['child']:
+            result = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'check_asgi_streaming', '--child'],
+                env=dict(os.environ, ASYNC_VIEWS='1'), capture_output=True, text=True,
+            )
+            self.stdout.write(result.stdout, ending='')
+            if result.returncode != 0:
+                raise CommandError(result.stderr.strip().removeprefix('CommandError: ') or "check_asgi_streaming failed.")
+            return
+        if not settings.ASYNC_VIEWS:
+            raise CommandError("--child needs ASYNC_VIEWS=1.")
+
+        today = datetime.date.today()
+        period = f'from={today.replace(year=today.year - 1)}&to={today}'
+        # (path, query, always more than one chunk)
+        requests = [
+            ('/api/gst-export/gstr1/', period, True),
+            ('/api/gst-export/einvoice/', period, True),
+        ]
+        invoice = Invoice.objects.exclude(pdf_file='').exclude(pdf_file=None).defer('snapshot').order_by('-pk').first()
+        if invoice:
+            requests.append((f'/api/invoice/{invoice.order_id}/pdf/', '', invoice.pdf_file.size > 64 * 1024))
+
+        from config.asgi import application
+        failures = []
+        for path, query, chunked in requests:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                status, bodies = asyncio.run(_get(application, path, query))
+            buffered = [str(w.message) for w in caught if 'synchronous iterators' in str(w.message)]
+            self.stdout.write(f"{path}: {status}, {sum(map(len, bodies))} bytes in {len(bodies)} messages")
+            if status != 200:
+                failures.append(f"{path}: status {status}")
+            if buffered:
+                failures.append(f"{path}: buffered ({buffered[0]})")
+            elif chunked and len(bodies) < 2:
+                failures.append(f"{path}: body sent in one message, not streamed")
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS("All streaming endpoints stream under ASGI."))
@@ -0,0 +1,75 @@
+"""
+Export GST filing JSON for a date range.
+Usage: python manage.py export_gst gstr1 2025-04-01 2025-04-30 -o gstr1_042025.json
+       python manage.py export_gst einvoice 2025-04-01 2025-04-30 -o einvoices.json
+"""
+import datetime
+import os
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config.db_router import replica_reads
+from invoices.gst_export import GstExportService, GstExportError
+from invoices.services import InvoiceGenerationError
+
+
+def _date(value: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}; use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Write GSTR-1 or e-invoice JSON for invoices dated in a period (reads from the replica if configured)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['gstr1', 'einvoice'])
+        parser.add_argument('start', help='First invoice date, YYYY-MM-DD.')
+        parser.add_argument('end', help='Last invoice date, YYYY-MM-DD.')
+        parser.add_argument('--period', help="GSTR-1 return period MMYYYY (default: the end date's month).")
+        parser.add_argument('-o', '--output', help='Output file (default: stdout).')
+
+    def handle(self, *args, **options):
+        start, end = _date(options['start']), _date(options['end'])
+        try:
+            with replica_reads():
+                # Everything that can be refused (period, shop, addresses) is checked here,
+                # before any output is written
+                if options['kind'] == 'gstr1':
+                    builder = GstExportService.gstr1(start, end, period=options['period'])
+                    chunks, stats = builder.iter_json(), builder.stats
+                else:
+                    GstExportService.check_einvoices(start, end)
+                    chunks, stats = GstExportService.iter_einvoices_json(start, end), None
+                if options['output']:
+                    _write_file(options['output'], chunks)
+                else:
+                    for chunk in chunks:
+                        sys.stdout.write(chunk)
+        except (GstExportError, InvoiceGenerationError) as e:
+            raise CommandError(str(e))
+        if stats is not None:
+            self.stderr.write(self.style.SUCCESS(
+                f"{stats['invoices']} invoices: {stats['b2b']} B2B, {stats['b2cl']} B2CL, {stats['b2cs']} B2CS"
+                + (f"; {stats['missing_pos']} without customer state code" if stats['missing_pos'] else '')
+            ))
+
+
+def _write_file(path: str, chunks) -> None:
+    """
+    Write to a temp file next to path and rename it into place once complete, so a
+    failed export never leaves a truncated file (or clobbers a previous good one).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.export_gst-', suffix='.tmp')
+    try:
+        with open(fd, 'w', encoding='utf-8') as out:
+            for chunk in chunks:
+                out.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
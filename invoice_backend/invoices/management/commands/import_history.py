@@ -0,0 +1,85 @@
+"""
+Import historical orders and their invoices (paper/Excel history) in bulk.
+Usage: python manage.py import_history history.csv --checkpoint import.ckpt
+       python manage.py import_history history.jsonl --date-format %d-%m-%Y --dry-run
+Rerunning with the same --checkpoint file resumes after the last committed batch.
+"""
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoices.bulk_import import BulkImportService, BulkImportError, read_records
+from invoices.services import InvoiceGenerationError
+
+
+class Command(BaseCommand):
+    help = "Bulk-import historical orders with their original invoice numbers and dates (PDFs rendered later)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON Lines file ('-' for stdin).")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders per transaction.')
+        parser.add_argument('--date-format', default='%Y-%m-%d', help='strptime format of invoice_date/order_date.')
+        parser.add_argument('--checkpoint', help='File recording the number of committed records; resumes from it.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the input without writing.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json', '.ndjson')) else 'csv')
+        checkpoint = options['checkpoint']
+        start = 0
+        if checkpoint and os.path.exists(checkpoint):
+            try:
+                with open(checkpoint) as f:
+                    start = int(f.read().strip() or 0)
+            except ValueError:
+                raise CommandError(f"Unreadable checkpoint file {checkpoint}.")
+            self.stderr.write(f"Resuming after record {start}")
+
+        dry_run = options['dry_run']
+        consumed = start
+        imported = skipped = items = 0
+        started = time.monotonic()
+        # utf-8-sig: spreadsheet exports often start with a byte order mark
+        try:
+            f = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        try:
+            records = islice(read_records(f, fmt), start, None)
+            for batch in BulkImportService.run(
+                records,
+                batch_size=max(1, options['batch_size']),
+                date_format=options['date_format'],
+                dry_run=dry_run,
+                start=start,
+            ):
+                consumed += batch['records']
+                imported += batch['imported']
+                skipped += batch['skipped']
+                items += batch['items']
+                if checkpoint and not dry_run:
+                    with open(checkpoint, 'w') as ckpt:
+                        ckpt.write(str(consumed))
+                elapsed = time.monotonic() - started
+                self.stderr.write(
+                    f"… {consumed} records, {imported} orders / {items} items imported, {skipped} already there "
+                    f"({items / elapsed if elapsed else 0:.0f} items/s)"
+                )
+        except (BulkImportError, InvoiceGenerationError) as e:
+            raise CommandError(str(e))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+        if checkpoint and not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.monotonic() - started
+        verb = 'would import' if dry_run else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{consumed - start} records read, {imported} orders with {items} items {verb}, "
+            f"{skipped} already imported, in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,25 @@
+"""
+Rebuild the full-text search documents from scratch.
+Run after bulk writes that bypass model signals (bulk_create, raw SQL, imports).
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+
+from invoices.models import Order
+from invoices.search import SearchIndex, SearchError
+
+
+class Command(BaseCommand):
+    help = "Drop and rebuild the invoices_search full-text index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        alias = router.db_for_write(Order)
+        try:
+            with transaction.atomic(using=alias):
+                count = SearchIndex.rebuild(connections[alias], Order, batch_size=max(1, options['batch_size']))
+        except SearchError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} orders."))
@@ -0,0 +1,71 @@
+"""
+Recompute stored order totals from their items after a tax-rule or rounding change.
+Usage: python manage.py recalculate_totals --dry-run          # print what would change
+       python manage.py recalculate_totals --checkpoint recalc.ckpt
+Rerunning with the same --checkpoint file resumes after the last committed chunk.
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoices.recalculate import RecalculationService
+
+
+class Command(BaseCommand):
+    help = "Recalculate Order totals (tax breakdown) from item amounts, in primary-key chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--after-id', type=int, default=0, help='Start after this order id.')
+        parser.add_argument('--checkpoint', help='File recording the last committed order id; resumes from it.')
+        parser.add_argument('--dry-run', action='store_true', help='Print the differences without writing.')
+        parser.add_argument(
+            '--include-invoiced', action='store_true',
+            help='Also recalculate orders that already have an invoice (their PDFs keep the old totals).',
+        )
+
+    def handle(self, *args, **options):
+        after_id = options['after_id']
+        checkpoint = options['checkpoint']
+        if checkpoint and os.path.exists(checkpoint):
+            try:
+                with open(checkpoint) as f:
+                    after_id = max(after_id, int(f.read().strip() or 0))
+            except ValueError:
+                raise CommandError(f"Unreadable checkpoint file {checkpoint}.")
+            self.stderr.write(f"Resuming after order {after_id}")
+
+        dry_run = options['dry_run']
+        scanned = changed = no_items = 0
+        started = time.monotonic()
+        for chunk in RecalculationService.run(
+            chunk_size=max(1, options['chunk_size']),
+            after_id=after_id,
+            dry_run=dry_run,
+            include_invoiced=options['include_invoiced'],
+        ):
+            scanned += chunk['scanned']
+            changed += len(chunk['changes'])
+            no_items += chunk['no_items']
+            if dry_run:
+                for order_id, diff in chunk['changes']:
+                    self.stdout.write(f"order {order_id}: " + ', '.join(
+                        f"{field} {old} → {new}" for field, (old, new) in diff.items()
+                    ))
+            elif checkpoint:
+                with open(checkpoint, 'w') as f:
+                    f.write(str(chunk['last_id']))
+            elapsed = time.monotonic() - started
+            self.stderr.write(
+                f"… {scanned} orders up to id {chunk['last_id']}, {changed} changed "
+                f"({scanned / elapsed if elapsed else 0:.0f} orders/s)"
+            )
+
+        if checkpoint and not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.monotonic() - started
+        verb = 'would change' if dry_run else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"{scanned} orders scanned, {changed} {verb}, {no_items} without items skipped in {elapsed:.1f}s"
+        ))
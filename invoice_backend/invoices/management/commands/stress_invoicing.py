@@ -0,0 +1,292 @@
+"""
+Concurrency stress test for ordering and invoicing, meant to run in CI against a scratch
+database (SQLite WAL or a local MySQL).
+
+--workers processes, each like a gunicorn worker, call POST /api/orders/ and
+POST /api/generate-invoice/<id>/ through the full Django stack. They invoice their own
+orders and other workers' orders while those are still being created, then all of
+them sweep every order at once. Each run is seeded, so it can be reproduced.
+
+Afterwards it checks that every order has exactly one invoice, that invoices match
+their orders, that numbers have no duplicates or gaps, and that every worker was
+given the same number for the same order. It also counts IntegrityErrors and other
+5xx responses. Any failure, or throughput below --min-invoices-per-sec, exits
+non-zero. Also reports throughput, latency and time spent in locking SQL statements.
+"""
+import multiprocessing
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+
+# Worker processes are spawned and import this module before django.setup(),
+# so models are imported inside the functions that use them.
+
+# Retries per generate call while rendering is busy (503), and the pause between them
+MAX_BUSY_RETRIES = 100
+BUSY_RETRY_PAUSE = 0.05
+
+
+def _pct(values, p) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class _LockTimer:
+    """connection.execute_wrapper that adds up time spent in statements that take locks."""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        head = sql.lstrip()[:6].upper()
+        if not (head in ('INSERT', 'UPDATE', 'DELETE', 'BEGIN ') or sql.rstrip().upper().endswith('FOR UPDATE')):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def _order_payload(rng, tag: str, index: int) -> dict:
+    items = []
+    for sno in range(1, rng.randint(1, 5) + 1):
+        quantity = Decimal(rng.randint(1, 20))
+        rate = Decimal(rng.randint(100, 500000)) / 100
+        items.append({
+            'sno': sno, 'description': f'Stress item {sno}', 'hsn_sac': '3208',
+            'quantity': str(quantity), 'rate': str(rate), 'amount': str(quantity * rate),
+        })
+    return {
+        'customer': {'name': f'{tag} {index}', 'state_code': rng.choice(['37', '36', '29'])},
+        'items': items,
+    }
+
+
+def _worker(index: int, options: dict, tag: str, start, sweep, results) -> None:
+    """One worker process: create and invoice orders, then sweep all of them."""
+    import django
+    django.setup()
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.db import IntegrityError, OperationalError
+    from invoices.admission import admission
+    from invoices.models import Order
+
+    setup_test_environment()
+    client = Client(raise_request_exception=False)
+    rng = random.Random(options['seed'] * 1000 + index)
+    timer = _LockTimer()
+    stats = {
+        'created': 0, 'generate_calls': 0, 'busy': 0, 'integrity_errors': 0,
+        'db_errors': 0, 'server_errors': 0, 'client_errors': 0, 'errors': [],
+        'create_seconds': [], 'generate_seconds': [], 'lock_seconds': [], 'invoice_no': {}, 'conflicts': 0,
+    }
+
+    def record_error(response, what):
+        exc = response.exc_info[1] if response.exc_info else None
+        if isinstance(exc, IntegrityError):
+            stats['integrity_errors'] += 1
+        elif isinstance(exc, OperationalError):
+            stats['db_errors'] += 1
+        elif response.status_code >= 500:
+            stats['server_errors'] += 1
+        else:
+            stats['client_errors'] += 1
+        if len(stats['errors']) < 5:
+            stats['errors'].append(f"{what}: {response.status_code} {exc!r}" if exc else f"{what}: {response.status_code} {response.content[:200]!r}")
+
+    def timed(kind, call):
+        locked_before = timer.seconds
+        started = time.perf_counter()
+        response = call()
+        stats[kind].append(time.perf_counter() - started)
+        stats['lock_seconds'].append(timer.seconds - locked_before)
+        return response
+
+    def generate(order_id):
+        for _ in range(MAX_BUSY_RETRIES):
+            stats['generate_calls'] += 1
+            response = timed('generate_seconds', lambda: client.post(f'/api/generate-invoice/{order_id}/'))
+            if response.status_code == 503:
+                stats['busy'] += 1
+                time.sleep(BUSY_RETRY_PAUSE * (1 + rng.random()))
+                continue
+            if response.status_code != 201:
+                record_error(response, f"generate {order_id}")
+                return
+            invoice_no = response.json()['invoice_no']
+            seen = stats['invoice_no'].setdefault(order_id, invoice_no)
+            if seen != invoice_no:
+                stats['conflicts'] += 1
+            return
+        stats['errors'].append(f"generate {order_id}: still busy after {MAX_BUSY_RETRIES} tries")
+
+    def run_order_ids():
+        return list(Order.objects.filter(customer__name__startswith=tag).values_list('pk', flat=True))
+
+    with connection.execute_wrapper(timer):
+        start.wait()
+        for i in range(options['orders']):
+            response = timed('create_seconds', lambda: client.post(
+                '/api/orders/', _order_payload(rng, tag, index * options['orders'] + i), content_type='application/json',
+            ))
+            if response.status_code != 201:
+                record_error(response, "create")
+                continue
+            stats['created'] += 1
+            # Overlap: this order, and others' orders that may still be in progress
+            ids = run_order_ids()
+            generate(response.json()['order_id'])
+            for order_id in rng.sample(ids, min(len(ids), options['overlap'])):
+                generate(order_id)
+        sweep.wait()
+        ids = run_order_ids()
+        rng.shuffle(ids)
+        for order_id in ids:
+            generate(order_id)
+
+    stats['admission_wait_seconds'] = admission.stats['wait_seconds_total']
+    results.put(stats)
+
+
+class Command(BaseCommand):
+    help = "Stress ordering and invoicing from several processes; non-zero exit on races or slow runs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--orders', type=int, default=20, help='Orders created per worker.')
+        parser.add_argument('--overlap', type=int, default=3, help="Other workers' orders invoiced after each create.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--min-invoices-per-sec', type=float, default=0,
+                            help='Fail below this throughput (0: report only).')
+        parser.add_argument('--allow-existing', action='store_true',
+                            help='Run even if the database already has invoices (numbering checks are then skipped).')
+
+    def handle(self, *args, **options):
+        from invoices.models import Invoice
+        existing = Invoice.objects.exists()
+        if existing and not options['allow_existing']:
+            raise CommandError("This adds orders and invoices; run it on a scratch database or pass --allow-existing.")
+        tag = f"stress-{uuid.uuid4().hex[:8]}"
+        self.stdout.write(
+            f"{connection.vendor}, {options['workers']} workers x {options['orders']} orders, "
+            f"overlap {options['overlap']}, seed {options['seed']}, tag {tag}"
+        )
+
+        # Fresh interpreters, like separate gunicorn workers; nothing shared but the database
+        context = multiprocessing.get_context('spawn')
+        start = context.Barrier(options['workers'] + 1)
+        sweep = context.Barrier(options['workers'])
+        results = context.Queue()
+        worker_options = {key: options[key] for key in ('orders', 'overlap', 'seed')}
+        connection.close()
+        processes = [
+            context.Process(target=_worker, args=(i, worker_options, tag, start, sweep, results))
+            for i in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        start.wait(timeout=120)
+        started = time.perf_counter()
+        stats = [results.get(timeout=3600) for _ in processes]
+        wall = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        failures = self._check(tag, stats, check_numbers=not existing)
+        self._report(stats, wall, tag)
+        invoices_per_sec = Invoice.objects.filter(order__customer__name__startswith=tag).count() / wall
+        if options['min_invoices_per_sec'] and invoices_per_sec < options['min_invoices_per_sec']:
+            failures.append(f"{invoices_per_sec:.1f} invoices/s < {options['min_invoices_per_sec']:g}")
+        if failures:
+            raise CommandError("Stress run failed:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("OK"))
+
+    def _check(self, tag, stats, check_numbers: bool) -> list:
+        from invoices.models import Invoice, InvoiceLine, Order
+        failures = []
+        for key in ('integrity_errors', 'db_errors', 'server_errors', 'client_errors', 'conflicts'):
+            total = sum(s[key] for s in stats)
+            if total:
+                failures.append(f"{key}: {total}")
+        for s in stats:
+            failures.extend(s['errors'])
+
+        # Every worker must have been told the same number for the same order
+        numbers = {}
+        for s in stats:
+            for order_id, invoice_no in s['invoice_no'].items():
+                if numbers.setdefault(order_id, invoice_no) != invoice_no:
+                    failures.append(f"order {order_id} returned as {numbers[order_id]} and {invoice_no}")
+
+        orders = (
+            Order.objects.filter(customer__name__startswith=tag)
+            .annotate(item_count=Count('items'), item_total=Sum('items__amount'))
+            .select_related('invoice')
+        )
+        lines = {
+            row['invoice__order_id']: (row['count'], row['total'])
+            for row in InvoiceLine.objects.filter(invoice__order__customer__name__startswith=tag)
+            .values('invoice__order_id').annotate(count=Count('pk'), total=Sum('amount'))
+        }
+        missing = 0
+        for order in orders:
+            invoice = getattr(order, 'invoice', None)
+            if invoice is None:
+                missing += 1
+                continue
+            line_count, line_total = lines.get(order.pk, (0, None))
+            if (line_count != order.item_count or line_total != order.item_total
+                    or Decimal(invoice.snapshot['totals']['total_before_tax']) != order.item_total):
+                failures.append(f"invoice {invoice.invoice_no} does not match order {order.pk} "
+                                f"({line_count}/{order.item_count} lines)")
+            if numbers.get(order.pk, invoice.invoice_no) != invoice.invoice_no:
+                failures.append(f"order {order.pk} stored as {invoice.invoice_no}, returned as {numbers[order.pk]}")
+        if missing:
+            failures.append(f"orders without invoice: {missing}")
+        if sum(s['created'] for s in stats) != len(orders):
+            failures.append(f"created {sum(s['created'] for s in stats)} orders, found {len(orders)}")
+
+        if check_numbers:
+            invoice_nos = list(Invoice.objects.values_list('invoice_no', flat=True))
+            if len(set(invoice_nos)) != len(invoice_nos):
+                failures.append("duplicate invoice numbers")
+            by_prefix = {}
+            for invoice_no in invoice_nos:
+                prefix, _, seq = invoice_no.rpartition('-')
+                by_prefix.setdefault(prefix, []).append(int(seq))
+            for prefix, seqs in by_prefix.items():
+                gaps = sorted(set(range(1, max(seqs) + 1)) - set(seqs))
+                if gaps:
+                    failures.append(f"{prefix}: missing numbers {gaps[:10]}{' ...' if len(gaps) > 10 else ''}")
+        return failures
+
+    def _report(self, stats, wall, tag):
+        from invoices.models import Invoice
+        created = sum(s['created'] for s in stats)
+        invoices = Invoice.objects.filter(order__customer__name__startswith=tag).count()
+        calls = sum(s['generate_calls'] for s in stats)
+        create_seconds = [t for s in stats for t in s['create_seconds']]
+        generate_seconds = [t for s in stats for t in s['generate_seconds']]
+        lock_seconds = [t for s in stats for t in s['lock_seconds']]
+        self.stdout.write(f"wall {wall:.2f}s: {created / wall:.1f} orders/s, {invoices / wall:.1f} invoices/s, "
+                          f"{(len(create_seconds) + calls) / wall:.1f} requests/s")
+        self.stdout.write(f"create   p50 {_pct(create_seconds, 0.5) * 1000:7.1f} ms  p95 {_pct(create_seconds, 0.95) * 1000:7.1f} ms")
+        self.stdout.write(f"generate p50 {_pct(generate_seconds, 0.5) * 1000:7.1f} ms  p95 {_pct(generate_seconds, 0.95) * 1000:7.1f} ms"
+                          f"  ({calls} calls, {sum(s['busy'] for s in stats)} busy)")
+        self.stdout.write(f"lock wait total {sum(lock_seconds):.2f}s, p95 per request {_pct(lock_seconds, 0.95) * 1000:.1f} ms; "
+                          f"render queue wait {sum(s['admission_wait_seconds'] for s in stats):.2f}s")
+        self.stdout.write(
+            "integrity errors {}, db errors {}, other 5xx {}, 4xx {}, conflicting numbers {}".format(
+                *(sum(s[key] for s in stats) for key in
+                  ('integrity_errors', 'db_errors', 'server_errors', 'client_errors', 'conflicts'))
+            )
+        )
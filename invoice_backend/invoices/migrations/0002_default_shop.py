@@ -5,9 +5,10 @@ from django.db import migrations
 
 def create_default_shop(apps, schema_editor):
     Shop = apps.get_model('invoices', 'Shop')
-    if Shop.objects.exists():
+    db_alias = schema_editor.connection.alias
+    if Shop.objects.using(db_alias).exists():
         return
-    Shop.objects.create(
+    Shop.objects.using(db_alias).create(
         name='SAI PAINTS',
         gstin='37PEFPS6526R1Z6',
         address='#17/505-A2, Kasapuram Road, GUNTAKAL-515 801, A.P.',
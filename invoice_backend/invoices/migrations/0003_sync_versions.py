@@ -0,0 +1,100 @@
+# Delta sync: change counter, Product, and indexed updated_at/version columns
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_versions(apps, schema_editor):
+    """Existing rows get version 1 so a client syncing from token 0 receives them."""
+    db_alias = schema_editor.connection.alias
+    for name in ('Customer', 'Order', 'OrderItem', 'Invoice'):
+        apps.get_model('invoices', name).objects.using(db_alias).update(version=1)
+    ChangeCounter = apps.get_model('invoices', 'ChangeCounter')
+    ChangeCounter.objects.using(db_alias).update_or_create(pk=1, defaults={'value': 1})
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0002_default_shop'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('version', models.BigIntegerField(db_index=True, default=0, editable=False)),
+                ('client_id', models.UUIDField(blank=True, null=True, unique=True)),
+                ('name', models.CharField(max_length=256)),
+                ('liters_per_can', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=8)),
+                ('quantity', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('dp', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('bill_percent', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=5)),
+                ('cd_percent', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=5)),
+                ('gst_percent', models.DecimalField(decimal_places=2, default=Decimal('18'), max_digits=5)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_versions, noop),
+    ]
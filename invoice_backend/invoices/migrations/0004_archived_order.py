@@ -0,0 +1,40 @@
+# Archive table for orders, items and invoices of closed financial years
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0003_sync_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('financial_year', models.PositiveSmallIntegerField(db_index=True)),
+                ('order_date', models.DateTimeField()),
+                ('total_before_tax', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('cgst_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('sgst_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('igst_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('is_inter_state', models.BooleanField(default=False)),
+                ('items', models.JSONField(default=list)),
+                ('invoice_no', models.CharField(blank=True, max_length=32, null=True, unique=True)),
+                ('invoice_date', models.DateField(blank=True, null=True)),
+                ('invoice_created_at', models.DateTimeField(blank=True, null=True)),
+                ('pdf_pack', models.CharField(blank=True, max_length=255)),
+                ('pdf_member', models.CharField(blank=True, max_length=255)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='invoices.customer')),
+            ],
+            options={
+                'ordering': ['-order_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Immutable invoice snapshot (and its copy on archived orders)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0004_archived_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='invoice_snapshot',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='snapshot',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Full-text search documents: SQLite FTS5 virtual table or MySQL FULLTEXT table.
+# DDL and backfill are inlined so later changes to invoices.search don't change this migration.
+
+from django.db import migrations
+
+CREATE_SQL = {
+    'sqlite': (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS invoices_search "
+        "USING fts5(customer, invoice_no, items, tokenize='unicode61')"
+    ),
+    'mysql': (
+        "CREATE TABLE IF NOT EXISTS invoices_search ("
+        "order_id BIGINT NOT NULL PRIMARY KEY, customer TEXT NOT NULL, "
+        "invoice_no VARCHAR(32) NOT NULL, items MEDIUMTEXT NOT NULL, "
+        "FULLTEXT KEY invoices_search_ft (customer, invoice_no, items)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    ),
+}
+INSERT_SQL = {
+    'sqlite': "INSERT OR REPLACE INTO invoices_search(rowid, customer, invoice_no, items) VALUES (%s, %s, %s, %s)",
+    'mysql': "REPLACE INTO invoices_search (order_id, customer, invoice_no, items) VALUES (%s, %s, %s, %s)",
+}
+BATCH_SIZE = 1000
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in CREATE_SQL:
+        return  # other backends: search endpoint reports it as unsupported
+    Order = apps.get_model('invoices', 'Order')
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL[connection.vendor])
+        last_pk = 0
+        while True:
+            orders = list(
+                Order.objects.using(connection.alias)
+                .filter(pk__gt=last_pk)
+                .select_related('customer', 'invoice')
+                .prefetch_related('items')
+                .order_by('pk')[:BATCH_SIZE]
+            )
+            if not orders:
+                break
+            last_pk = orders[-1].pk
+            cursor.executemany(INSERT_SQL[connection.vendor], [
+                [
+                    order.pk,
+                    ' '.join(filter(None, (order.customer.name, order.customer.phone, order.customer.gstin))),
+                    order.invoice.invoice_no if hasattr(order, 'invoice') else '',
+                    ' '.join(item.description for item in sorted(order.items.all(), key=lambda i: i.sno)),
+                ]
+                for order in orders
+            ])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute("DROP TABLE IF EXISTS invoices_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0005_invoice_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
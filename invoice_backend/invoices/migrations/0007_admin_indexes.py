@@ -0,0 +1,43 @@
+# Indexes behind admin date hierarchies, search fields and default orderings
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='gstin',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='name',
+            field=models.CharField(db_index=True, max_length=256),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='phone',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_date',
+            field=models.DateField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
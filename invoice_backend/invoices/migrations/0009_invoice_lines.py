@@ -0,0 +1,31 @@
+# Invoice lines frozen as rows (snapshot v2) instead of a list inside Invoice.snapshot
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0008_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sno', models.PositiveSmallIntegerField()),
+                ('description', models.CharField(max_length=256)),
+                ('hsn_sac', models.CharField(max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='invoices.invoice')),
+            ],
+            options={
+                'ordering': ['invoice', 'sno'],
+                'unique_together': {('invoice', 'sno')},
+            },
+        ),
+    ]
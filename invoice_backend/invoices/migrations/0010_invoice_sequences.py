@@ -0,0 +1,21 @@
+# Per-prefix invoice number counters (InvoiceSequence), seeded lazily from existing invoices
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0009_invoice_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=32, unique=True)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -3,7 +3,95 @@ Models for GST Invoice system.
 MVC: Models hold business entities; services perform operations.
 """
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+
+
+class ChangeCounter(models.Model):
+    """
+    Single-row, monotonically increasing change token for delta sync.
+    Bumping it takes a row lock held until commit, so versions become visible in order.
+    That lock serializes every versioned write in the app: take the version as late in
+    a transaction as possible (after PDF rendering, e-mail, other slow work).
+    """
+    value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def next_version(cls) -> int:
+        """Increment and return the counter. Call inside a transaction."""
+        updated = cls.objects.filter(pk=1).update(value=F('value') + 1)
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={'value': 0})
+            cls.objects.filter(pk=1).update(value=F('value') + 1)
+        return cls.objects.values_list('value', flat=True).get(pk=1)
+
+    @classmethod
+    def current(cls) -> int:
+        """Latest committed change token (0 if nothing has changed yet)."""
+        return cls.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+
+
+class InvoiceSequence(models.Model):
+    """
+    Last invoice number issued per prefix and year ('SP-2026-'). Bumping it locks the row
+    until commit, so invoices with one prefix take numbers one at a time. Same pattern as
+    ChangeCounter; a locking read of the latest invoice instead took gap locks on MySQL
+    that deadlocked concurrent allocations.
+    """
+    prefix = models.CharField(max_length=32, unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def next_number(cls, prefix: str, seed) -> int:
+        """
+        Increment and return the prefix's counter. Call inside a transaction. seed() gives
+        the last number already issued, for a prefix without a counter yet.
+        """
+        updated = cls.objects.filter(prefix=prefix).update(last_number=F('last_number') + 1)
+        if not updated:
+            cls.objects.get_or_create(prefix=prefix, defaults={'last_number': seed()})
+            cls.objects.filter(prefix=prefix).update(last_number=F('last_number') + 1)
+        return cls.objects.values_list('last_number', flat=True).get(prefix=prefix)
+
+    @classmethod
+    def advance(cls, prefix: str, number: int, seed) -> None:
+        """
+        Move the counter up to number if it is behind (numbers written directly, e.g.
+        imports). Creates a missing counter, so the row is locked either way.
+        """
+        cls.objects.get_or_create(prefix=prefix, defaults={'last_number': max(number, seed())})
+        cls.objects.filter(prefix=prefix, last_number__lt=number).update(last_number=number)
+
+
+class SyncTrackedModel(models.Model):
+    """Abstract base: stamps updated_at and a change version on every save."""
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    version = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'updated_at', 'version'}
+        with transaction.atomic():
+            self.version = ChangeCounter.next_version()
+            super().save(*args, **kwargs)
+
+
+class SyncTombstone(models.Model):
+    """
+    A deleted synced row (hard delete, cascade or archive_year), so delta sync can tell
+    clients to drop it. Written by a post_delete handler (invoices/signals.py).
+    """
+    model = models.CharField(max_length=32)  # payload key in invoices.sync.SYNC_MODELS, e.g. 'orders'
+    object_id = models.BigIntegerField()
+    version = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} (deleted)"
 
 
 class Shop(models.Model):
@@ -27,12 +115,31 @@ class Shop(models.Model):
         return self.name
 
 
-class Customer(models.Model):
-    """Customer/buyer details for billing."""
+class Product(SyncTrackedModel):
+    """Paint product in stock (mirrors the billing client's product list)."""
+    client_id = models.UUIDField(null=True, blank=True, unique=True)  # id generated offline by the client
     name = models.CharField(max_length=256)
+    liters_per_can = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0'))
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    dp = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))  # dealer price per can
+    bill_percent = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0'))
+    cd_percent = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0'))
+    gst_percent = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('18'))
+    is_active = models.BooleanField(default=True)  # False acts as a tombstone for sync clients
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class Customer(SyncTrackedModel):
+    """Customer/buyer details for billing."""
+    name = models.CharField(max_length=256, db_index=True)
     address = models.TextField(blank=True)
-    gstin = models.CharField(max_length=20, blank=True)
-    phone = models.CharField(max_length=20, blank=True)
+    gstin = models.CharField(max_length=20, blank=True, db_index=True)
+    phone = models.CharField(max_length=20, blank=True, db_index=True)
     email = models.EmailField(blank=True)  # For sending invoice by email
     state_code = models.CharField(max_length=4, blank=True)  # 37 = A.P. → CGST+SGST; else IGST
 
@@ -43,10 +150,11 @@ class Customer(models.Model):
         return self.name
 
 
-class Order(models.Model):
+class Order(SyncTrackedModel):
     """Order placed by customer; one order can have one invoice."""
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='orders')
-    order_date = models.DateTimeField(auto_now_add=True)
+    client_id = models.UUIDField(null=True, blank=True, unique=True)  # offline sale id; makes POST /sync idempotent
+    order_date = models.DateTimeField(auto_now_add=True, db_index=True)
     total_before_tax = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
     cgst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
     sgst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
@@ -61,7 +169,7 @@ class Order(models.Model):
         return f"Order #{self.id} - {self.customer.name}"
 
 
-class OrderItem(models.Model):
+class OrderItem(SyncTrackedModel):
     """Line item in an order."""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     sno = models.PositiveSmallIntegerField()
@@ -79,16 +187,69 @@ class OrderItem(models.Model):
         return f"{self.order_id} - {self.description}"
 
 
-class Invoice(models.Model):
+class Invoice(SyncTrackedModel):
     """Generated invoice; one per order. Prevents duplicate generation."""
     order = models.OneToOneField(Order, on_delete=models.PROTECT, related_name='invoice')
     invoice_no = models.CharField(max_length=32, unique=True)  # SP-YYYY-XXXX
-    invoice_date = models.DateField(auto_now_add=True)
+    invoice_date = models.DateField(auto_now_add=True, db_index=True)
     pdf_file = models.FileField(upload_to='invoices/%Y/%m/', blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    snapshot = models.JSONField(default=dict, blank=True)  # frozen PDF header data, see invoices/snapshot.py
 
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
         return self.invoice_no
+
+
+class InvoiceLine(models.Model):
+    """
+    Line item frozen with its invoice (snapshot v2, see invoices/snapshot.py). One row per
+    line rather than a list in Invoice.snapshot, so renders and exports stream them.
+    """
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='lines')
+    sno = models.PositiveSmallIntegerField()
+    description = models.CharField(max_length=256)
+    hsn_sac = models.CharField(max_length=20)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    rate = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        ordering = ['invoice', 'sno']
+        unique_together = [('invoice', 'sno')]
+
+    def __str__(self):
+        return f"{self.invoice_id} - {self.description}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Order from a closed financial year, with its items and invoice, moved out of the
+    hot tables by `manage.py archive_year`. Keeps the original order id as primary key.
+    """
+    id = models.BigIntegerField(primary_key=True)  # original Order.id
+    financial_year = models.PositiveSmallIntegerField(db_index=True)  # 2024 → FY 2024-25 (Apr–Mar)
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='archived_orders')
+    order_date = models.DateTimeField()
+    total_before_tax = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    cgst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    sgst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    igst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    is_inter_state = models.BooleanField(default=False)
+    items = models.JSONField(default=list)  # [{sno, description, hsn_sac, quantity, rate, amount}], decimals as strings
+    invoice_no = models.CharField(max_length=32, unique=True, null=True, blank=True)
+    invoice_date = models.DateField(null=True, blank=True)
+    invoice_created_at = models.DateTimeField(null=True, blank=True)
+    invoice_snapshot = models.JSONField(null=True, blank=True)  # Invoice.snapshot, carried over
+    pdf_pack = models.CharField(max_length=255, blank=True)  # storage name of the per-year zip
+    pdf_member = models.CharField(max_length=255, blank=True)  # file name inside the pack
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-order_date']
+
+    def __str__(self):
+        return self.invoice_no or f"Archived order #{self.id}"
@@ -1,15 +1,35 @@
 """
 Generate GST Tax Invoice PDF matching SAI PAINTS printed layout (reportlab).
+
+Compact output (compact=True) writes binary Flate streams instead of ASCII85-wrapped
+ones and, when the optional pikepdf package is installed, packs the PDF's objects into
+compressed object streams; linearize=True also reorders it for first-page display
+before the whole file has downloaded.
 """
+import logging
 import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from io import BytesIO
 from decimal import Decimal
+from functools import lru_cache
+from types import SimpleNamespace
 
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Flowable
+
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
+logger = logging.getLogger(__name__)
 
 # A4 in points (reportlab default); Helvetica/Helvetica-Bold are built-in
 PAGE_WIDTH, PAGE_HEIGHT = A4
@@ -19,13 +39,217 @@ BODY_FONT_SIZE = 9
 TITLE_FONT_SIZE = 14
 
 
-def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: str) -> BytesIO:
+@lru_cache(maxsize=1)
+def get_invoice_styles() -> dict:
+    """Paragraph styles used by the invoice; built once per process."""
+    base = getSampleStyleSheet()['Normal']
+    return {
+        'normal': ParagraphStyle('InvoiceNormal', parent=base, fontName='Helvetica', fontSize=BODY_FONT_SIZE),
+        'title': ParagraphStyle(
+            'InvoiceTitle', parent=base, fontName='Helvetica-Bold', fontSize=TITLE_FONT_SIZE, alignment=1,
+        ),
+        'small': ParagraphStyle('InvoiceSmall', parent=base, fontName='Helvetica', fontSize=8),
+        'shop_name': ParagraphStyle('ShopName', parent=base, fontName='Helvetica-Bold', fontSize=16, alignment=1),
+        'shop_address': ParagraphStyle(
+            'ShopAddress', parent=base, fontName='Helvetica', fontSize=BODY_FONT_SIZE, alignment=1,
+        ),
+        'section': ParagraphStyle('Section', parent=base, fontName='Helvetica-Bold', fontSize=10),
+        'words': ParagraphStyle('Words', parent=base, fontName='Helvetica', fontSize=BODY_FONT_SIZE),
+        'bank': ParagraphStyle('Bank', parent=base, fontName='Helvetica', fontSize=BODY_FONT_SIZE),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_table_styles() -> dict:
+    """
+    Table styles used by the invoice; built once per process and shared by every table.
+    This only saves rebuilding them per render: the PDF has no style objects to share.
+    """
+    def cells(size, *commands):
+        return TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), size),
+            *commands,
+        ])
+    return {
+        'header': cells(
+            9,
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+        ),
+        'invoice_row': cells(
+            BODY_FONT_SIZE,
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ),
+        'customer': cells(BODY_FONT_SIZE),
+        'items': cells(
+            TABLE_HEADER_FONT_SIZE,
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e5e7eb')),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (3, 0), (5, -1), 'RIGHT'),
+            ('ALIGN', (1, 0), (2, -1), 'LEFT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ),
+        # Totals and footer: label left, amount/signature right
+        'right_column': cells(BODY_FONT_SIZE, ('ALIGN', (1, 0), (1, -1), 'RIGHT')),
+    }
+
+
+# reportlab reads the stream encoding from the process-wide rl_config.useA85 when it
+# writes a file, so builds that want different encodings must not overlap
+_encoding_changed = threading.Condition()
+_encoding_builds = 0
+_encoding_binary = False
+_DEFAULT_USE_A85 = rl_config.useA85
+
+
+@contextmanager
+def _stream_encoding(binary: bool):
+    """
+    Hold rl_config.useA85 for one build: binary Flate streams (no ASCII85 wrapper, which
+    adds 25%) for compact builds, reportlab's default otherwise. Builds wanting the same
+    encoding run together; one wanting the other waits until they are done. With a
+    single PDF_COMPACT setting every build wants the same, so none ever waits.
+    """
+    global _encoding_builds, _encoding_binary
+    with _encoding_changed:
+        while _encoding_builds and _encoding_binary != binary:
+            _encoding_changed.wait()
+        if not _encoding_builds:
+            _encoding_binary = binary
+            rl_config.useA85 = 0 if binary else _DEFAULT_USE_A85
+        _encoding_builds += 1
+    try:
+        yield
+    finally:
+        with _encoding_changed:
+            _encoding_builds -= 1
+            if not _encoding_builds:
+                _encoding_changed.notify_all()
+
+
+def _rewrite_with_pikepdf(buffer, linearize: bool) -> None:
+    """Rewrite the PDF in buffer in place with object streams (and linearized if asked)."""
+    buffer.seek(0)
+    with tempfile.TemporaryFile() as rewritten:
+        with pikepdf.open(buffer) as pdf:
+            pdf.save(
+                rewritten,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                linearize=linearize,
+            )
+        rewritten.seek(0)
+        buffer.seek(0)
+        buffer.truncate()
+        shutil.copyfileobj(rewritten, buffer)
+
+
+def _item_row(item) -> list:
+    return [
+        str(item.sno),
+        item.description,
+        item.hsn_sac,
+        str(item.quantity),
+        str(item.rate),
+        str(item.amount),
+    ]
+
+
+class StreamingItemsTable(Flowable):
+    """
+    Items table that pulls rows from an iterator one frame at a time.
+    On each split it lays out only the rows that fit the remaining space (header repeated,
+    like Table(repeatRows=1)), so memory stays bounded however many items the order has.
     """
-    Build PDF buffer for the given order and invoice meta.
+
+    def __init__(self, header, rows, col_widths, style):
+        super().__init__()
+        self._header = header
+        self._rows = iter(rows)
+        self._buffer = []
+        self._exhausted = False
+        self._col_widths = col_widths
+        self._style = style
+        self._final = None
+        self._header_height = None
+        self._row_height = None
+
+    def _fill(self, count: int) -> None:
+        while len(self._buffer) < count and not self._exhausted:
+            try:
+                self._buffer.append(next(self._rows))
+            except StopIteration:
+                self._exhausted = True
+
+    def _table(self, rows) -> Table:
+        table = Table([self._header] + rows, colWidths=self._col_widths, repeatRows=1)
+        table.setStyle(self._style)
+        return table
+
+    def _rows_fitting(self, avail_width, avail_height) -> int:
+        """Largest n such that header + the next n rows fit in avail_height."""
+        if self._row_height is None:
+            # Single-line rows are the shortest possible, so this gives an upper bound on n
+            self._header_height = self._table([]).wrap(avail_width, avail_height)[1]
+            blank_row = [''] * len(self._header)
+            self._row_height = self._table([blank_row]).wrap(avail_width, avail_height)[1] - self._header_height
+        upper = max(0, int((avail_height - self._header_height) // self._row_height))
+        self._fill(upper + 1)
+        hi = min(upper, len(self._buffer))
+        if self._table(self._buffer[:hi]).wrap(avail_width, avail_height)[1] <= avail_height:
+            return hi
+        # Some multi-line rows: binary search below the bound
+        lo, hi = 0, hi - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._table(self._buffer[:mid]).wrap(avail_width, avail_height)[1] <= avail_height:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def wrap(self, avail_width, avail_height):
+        n = self._rows_fitting(avail_width, avail_height)
+        if self._exhausted and n == len(self._buffer):
+            self._final = self._table(self._buffer)
+            return self._final.wrap(avail_width, avail_height)
+        # More rows than fit: report overflow so the frame asks us to split
+        self._final = None
+        return avail_width, avail_height + 1
+
+    def split(self, avail_width, avail_height):
+        n = self._rows_fitting(avail_width, avail_height)
+        if n == 0:
+            return []
+        head = self._table(self._buffer[:n])
+        del self._buffer[:n]
+        # The remainder is this same object; clear the doc's "postponed once" mark so
+        # it may move to the next frame again, as a fresh split part would.
+        self.__dict__.pop('_postponed', None)
+        return [head, self]
+
+    def draw(self):
+        self._final.drawOn(self.canv, 0, 0)
+
+
+def build_invoice_pdf(
+    shop, order, invoice_no, invoice_date, amount_in_words: str, items=None, output=None,
+    compact: bool = False, linearize: bool = False,
+):
+    """
+    Build PDF for the given order and invoice meta into output (a writable binary file),
+    or into a new BytesIO when output is None. Returns the file, rewound.
     Layout matches: Header (SAI PAINTS, GSTIN, Address, Cell, State, TAX INVOICE, No, Date),
     Customer section, Items table, Totals/tax, Bank details, Footer (Receiver, Authorised Signatory).
+    items defaults to order.items ordered by sno; pass any iterable of item-like objects
+    (e.g. a DB iterator) to control the query. It is consumed lazily, page by page.
+    compact and linearize select the output optimizations described in the module
+    docstring; the rendered pages are the same either way.
     """
-    buffer = BytesIO()
+    buffer = output if output is not None else BytesIO()
 
     doc = SimpleDocTemplate(
         buffer,
@@ -35,26 +259,8 @@ def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: st
         topMargin=MARGIN,
         bottomMargin=MARGIN,
     )
-    styles = getSampleStyleSheet()
-    normal = ParagraphStyle(
-        'InvoiceNormal',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=BODY_FONT_SIZE,
-    )
-    title_style = ParagraphStyle(
-        'InvoiceTitle',
-        parent=styles['Normal'],
-        fontName='Helvetica-Bold',
-        fontSize=TITLE_FONT_SIZE,
-        alignment=1,
-    )
-    small = ParagraphStyle(
-        'InvoiceSmall',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=8,
-    )
+    styles = get_invoice_styles()
+    table_styles = get_table_styles()
 
     story = []
 
@@ -65,34 +271,19 @@ def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: st
         ["", "", f"Code : {shop.state_code}"],
     ]
     header_table = Table(header_data, colWidths=[PAGE_WIDTH / 3 - MARGIN * 2] * 3)
-    header_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-        ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-    ]))
+    header_table.setStyle(table_styles['header'])
     story.append(header_table)
     story.append(Spacer(1, 4 * mm))
 
-    story.append(Paragraph(shop.name, ParagraphStyle(
-        'ShopName', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=16, alignment=1
-    )))
-    story.append(Paragraph(shop.address, ParagraphStyle(
-        'ShopAddress', parent=styles['Normal'], fontName='Helvetica', fontSize=BODY_FONT_SIZE, alignment=1
-    )))
+    story.append(Paragraph(shop.name, styles['shop_name']))
+    story.append(Paragraph(shop.address, styles['shop_address']))
     story.append(Spacer(1, 2 * mm))
 
     # Invoice No & Date row
     inv_row = Table([
         [f"No: {invoice_no}", f"Date: {invoice_date}"],
     ], colWidths=[PAGE_WIDTH / 2 - MARGIN, PAGE_WIDTH / 2 - MARGIN])
-    inv_row.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), BODY_FONT_SIZE),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-    ]))
+    inv_row.setStyle(table_styles['invoice_row'])
     story.append(inv_row)
     story.append(Spacer(1, 6 * mm))
 
@@ -100,7 +291,7 @@ def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: st
     cust = order.customer
     story.append(Paragraph(
         "<b>Details of Receive (Billed)</b>",
-        ParagraphStyle('Section', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=10),
+        styles['section'],
     ))
     story.append(Spacer(1, 2 * mm))
     customer_data = [
@@ -110,25 +301,14 @@ def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: st
         [f"GSTIN: {cust.gstin or '........................'}"],
     ]
     cust_table = Table(customer_data, colWidths=[PAGE_WIDTH - 2 * MARGIN])
-    cust_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), BODY_FONT_SIZE),
-    ]))
+    cust_table.setStyle(table_styles['customer'])
     story.append(cust_table)
     story.append(Spacer(1, 6 * mm))
 
     # ----- Table: S.No, Description, HSN/SAC, Qty, Rate, Amount -----
     table_headers = ['S. No', 'Description of Goods', 'HSN/SAC', 'Qty.', 'Rate', 'Amount']
-    row_data = [table_headers]
-    for item in order.items.all().order_by('sno'):
-        row_data.append([
-            str(item.sno),
-            item.description,
-            item.hsn_sac,
-            str(item.quantity),
-            str(item.rate),
-            str(item.amount),
-        ])
+    if items is None:
+        items = order.items.all().order_by('sno')
 
     col_widths = [
         10 * mm,
@@ -143,17 +323,12 @@ def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: st
     if abs(total_w - (PAGE_WIDTH - 2 * MARGIN)) > 2:
         col_widths[1] = (PAGE_WIDTH - 2 * MARGIN) - (total_w - col_widths[1])
 
-    items_table = Table(row_data, colWidths=col_widths, repeatRows=1)
-    items_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), TABLE_HEADER_FONT_SIZE),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e5e7eb')),
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-        ('ALIGN', (3, 0), (5, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (2, -1), 'LEFT'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
+    items_table = StreamingItemsTable(
+        table_headers,
+        (_item_row(item) for item in items),
+        col_widths,
+        table_styles['items'],
+    )
     story.append(items_table)
     story.append(Spacer(1, 4 * mm))
 
@@ -173,23 +348,19 @@ def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: st
     ]
     tot_col_w = (PAGE_WIDTH - 2 * MARGIN) * 0.75, (PAGE_WIDTH - 2 * MARGIN) * 0.25
     tot_table = Table(totals_data, colWidths=tot_col_w)
-    tot_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), BODY_FONT_SIZE),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-    ]))
+    tot_table.setStyle(table_styles['right_column'])
     story.append(tot_table)
     story.append(Spacer(1, 3 * mm))
     story.append(Paragraph(
         f"<b>Total Invoice Amount in Words:</b> {amount_in_words}",
-        ParagraphStyle('Words', parent=styles['Normal'], fontName='Helvetica', fontSize=BODY_FONT_SIZE),
+        styles['words'],
     ))
     story.append(Spacer(1, 8 * mm))
 
     # ----- Bank Details -----
     story.append(Paragraph(
         f"<b>{shop.bank_name}</b><br/>Bank Account No.: {shop.bank_account_no}<br/>Bank Branch IFSC: {shop.bank_ifsc}<br/>Cell: {shop.cell}",
-        ParagraphStyle('Bank', parent=styles['Normal'], fontName='Helvetica', fontSize=BODY_FONT_SIZE),
+        styles['bank'],
     ))
     story.append(Spacer(1, 10 * mm))
 
@@ -204,13 +375,36 @@ def build_invoice_pdf(shop, order, invoice_no, invoice_date, amount_in_words: st
         ['', 'Authorised Signatory'],
     ]
     footer_table = Table(footer_data, colWidths=[(PAGE_WIDTH - 2 * MARGIN) / 2] * 2)
-    footer_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), BODY_FONT_SIZE),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-    ]))
+    footer_table.setStyle(table_styles['right_column'])
     story.append(footer_table)
 
-    doc.build(story)
+    with _stream_encoding(binary=compact):
+        doc.build(story)
+    if (compact or linearize) and pikepdf is not None:
+        _rewrite_with_pikepdf(buffer, linearize)
+    elif linearize:
+        logger.warning("PDF linearization needs the optional pikepdf package; writing a regular PDF.")
     buffer.seek(0)
     return buffer
+
+
+def prewarm() -> None:
+    """
+    Render one throwaway invoice without touching the database, so reportlab's
+    modules, font metrics and styles (and pikepdf, if installed) are loaded before
+    the first real request.
+    Called from gunicorn hooks (see gunicorn.conf.py).
+    """
+    shop = SimpleNamespace(
+        name='Prewarm', gstin='', address='', cell='', state='', state_code='',
+        bank_name='', bank_account_no='', bank_ifsc='',
+    )
+    order = SimpleNamespace(
+        customer=SimpleNamespace(name='Prewarm', address='', phone='', gstin=''),
+        total_before_tax=Decimal('0'), cgst_amount=Decimal('0'), sgst_amount=Decimal('0'),
+        igst_amount=Decimal('0'), total_amount=Decimal('0'),
+    )
+    item = SimpleNamespace(
+        sno=1, description='Prewarm', hsn_sac='', quantity=Decimal('1'), rate=Decimal('0'), amount=Decimal('0'),
+    )
+    build_invoice_pdf(shop, order, 'PREWARM', '', 'Zero Only', items=[item], compact=True)
@@ -0,0 +1,64 @@
+"""
+Invoice preview for an unsaved order: the same tax breakdown, amount in words and
+layout data as a generated invoice, without allocating an invoice number or touching
+storage or the order tables. Previews are cached by payload, so re-showing an
+unchanged cart is a cache hit.
+"""
+import hashlib
+import json
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .services import InvoiceGenerationService
+from .snapshot import SNAPSHOT_VERSION, SHOP_FIELDS, CUSTOMER_FIELDS, ITEM_FIELDS, build_snapshot, item_row
+from .utils import get_tax_breakdown
+
+CACHE_PREFIX = 'invoice-preview'
+
+
+class InvoicePreviewService:
+    """Builds (and caches) invoice previews from validated OrderCreateSerializer data."""
+
+    @staticmethod
+    def _cache_key(shop, validated_data: dict, invoice_date) -> str:
+        payload = json.dumps(
+            [SNAPSHOT_VERSION, str(invoice_date), [getattr(shop, f) for f in SHOP_FIELDS], validated_data],
+            sort_keys=True,
+            cls=DjangoJSONEncoder,
+        )
+        return f"{CACHE_PREFIX}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    @staticmethod
+    def _build(shop, validated_data: dict, invoice_date) -> dict:
+        customer_data = validated_data['customer']
+        items = sorted((SimpleNamespace(**item) for item in validated_data['items']), key=lambda item: item.sno)
+        customer = SimpleNamespace(**{f: customer_data.get(f, '') for f in CUSTOMER_FIELDS})
+        breakdown = get_tax_breakdown(sum(item.amount for item in items), customer.state_code)
+        order = SimpleNamespace(pk=None, customer=customer, **breakdown)
+        preview = build_snapshot(shop, order, None, invoice_date)
+        preview['items'] = [dict(zip(ITEM_FIELDS, item_row(item))) for item in items]
+        for rate in ('cgst_rate', 'sgst_rate', 'igst_rate'):
+            preview['totals'][rate] = str(breakdown[rate])
+        return preview
+
+    @classmethod
+    def preview(cls, validated_data: dict, as_html: bool = False):
+        """
+        Invoice data as generate would produce it, with invoice_no None; or, with as_html,
+        the layout rendered by templates/invoices/invoice_preview.html. Cached either way.
+        """
+        shop = InvoiceGenerationService.get_shop()
+        invoice_date = timezone.now().date()
+        key = cls._cache_key(shop, validated_data, invoice_date) + (':html' if as_html else '')
+        result = cache.get(key)
+        if result is None:
+            result = cls._build(shop, validated_data, invoice_date)
+            if as_html:
+                result = render_to_string('invoices/invoice_preview.html', result)
+            cache.set(key, result, settings.INVOICE_PREVIEW_CACHE_SECONDS)
+        return result
@@ -0,0 +1,109 @@
+"""
+Bulk recalculation of stored order totals (after a tax-rule or rounding change).
+Walks orders in primary-key chunks: one grouped SUM over items per chunk, breakdowns
+from utils.get_tax_breakdown, and one batched UPDATE per chunk for the orders that changed.
+Each chunk is read, recomputed and written in one transaction with its orders locked.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ChangeCounter, Order, OrderItem
+from .utils import get_tax_breakdown
+
+# Stored fields recomputed from the items
+TOTAL_FIELDS = ('total_before_tax', 'cgst_amount', 'sgst_amount', 'igst_amount', 'total_amount', 'is_inter_state')
+WRITTEN_FIELDS = TOTAL_FIELDS + ('version', 'updated_at')
+
+
+class RecalculationService:
+    """Service layer for recomputing Order totals in bulk."""
+
+    @staticmethod
+    def run(chunk_size: int = 1000, after_id: int = 0, dry_run: bool = False, include_invoiced: bool = False):
+        """
+        Recalculate orders with id > after_id, chunk by chunk. Yields one dict per chunk:
+        {'last_id', 'scanned', 'no_items', 'changes': [(order_id, {field: (old, new)})]}.
+        Each chunk commits on its own, so a stopped run resumes from the last yielded last_id.
+        Invoiced orders keep the totals printed on their invoice unless include_invoiced.
+        """
+        orders = Order.objects.select_related('customer').only('pk', 'customer__state_code', *TOTAL_FIELDS)
+        if not include_invoiced:
+            orders = orders.filter(invoice__isnull=True)
+        if not dry_run:
+            # Locked from the read to the write: invoicing locks the order too, so an order
+            # can't be invoiced (or retotalled) between reading its totals and overwriting them
+            orders = orders.select_for_update(of=('self',))
+        last_id = after_id
+        while True:
+            with transaction.atomic():
+                result = RecalculationService._chunk(orders, last_id, chunk_size, dry_run)
+            if result is None:
+                return
+            last_id = result['last_id']
+            yield result
+
+    @staticmethod
+    def _chunk(orders, after_id: int, chunk_size: int, dry_run: bool):
+        """Recalculate (and unless dry_run, write) the next chunk; None when done."""
+        chunk = list(orders.filter(pk__gt=after_id).order_by('pk')[:chunk_size])
+        if not chunk:
+            return None
+        first_id, last_id = chunk[0].pk, chunk[-1].pk
+        items = OrderItem.objects.filter(order_id__gte=first_id, order_id__lte=last_id)
+        if not dry_run:
+            # A locking read: item edits in the chunk's range wait until its totals are written
+            items = items.select_for_update()
+        sums = dict(
+            items
+            .values('order_id')
+            .annotate(total=Sum('amount'))
+            .order_by()
+            .values_list('order_id', 'total')
+        )
+
+        changed, changes, no_items = [], [], 0
+        for order in chunk:
+            total = sums.get(order.pk)
+            if total is None:
+                no_items += 1
+                continue
+            breakdown = get_tax_breakdown(total, order.customer.state_code or '')
+            diff = {
+                field: (getattr(order, field), breakdown[field])
+                for field in TOTAL_FIELDS
+                if getattr(order, field) != breakdown[field]
+            }
+            if diff:
+                for field, (_, new) in diff.items():
+                    setattr(order, field, new)
+                changed.append(order)
+                changes.append((order.pk, diff))
+
+        if changed and not dry_run:
+            RecalculationService._write(changed, ChangeCounter.next_version(), timezone.now())
+        return {'last_id': last_id, 'scanned': len(chunk), 'no_items': no_items, 'changes': changes}
+
+    @staticmethod
+    def _write(orders, version: int, now) -> None:
+        """
+        One parameterised UPDATE executed for all rows (executemany). bulk_update's
+        CASE WHEN per field costs ~2ms of Python per row; this is bound by the database.
+        It skips save(), so the sync fields are stamped here.
+        """
+        connection = connections[router.db_for_write(Order)]
+        qn = connection.ops.quote_name
+        fields = [Order._meta.get_field(name) for name in WRITTEN_FIELDS]
+        sql = "UPDATE {} SET {} WHERE {} = %s".format(
+            qn(Order._meta.db_table),
+            ', '.join(f"{qn(field.column)} = %s" for field in fields),
+            qn(Order._meta.pk.column),
+        )
+        for order in orders:
+            order.version = version
+            order.updated_at = now
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(getattr(order, field.attname), connection) for field in fields] + [order.pk]
+                for order in orders
+            ])
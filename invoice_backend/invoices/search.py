@@ -0,0 +1,225 @@
+"""
+Full-text search over orders: customer name/phone/GSTIN, invoice number and item descriptions.
+One search document per order, in the `invoices_search` table:
+SQLite → FTS5 virtual table (rowid = order id), MySQL → InnoDB table with a FULLTEXT index.
+Documents are kept in sync by signal handlers (invoices/signals.py): changes to an order
+or its items mark it dirty, and each dirty order is rebuilt once when the transaction commits.
+"""
+import re
+from collections import defaultdict
+
+from asgiref.local import Local
+from django.db import connections, router, transaction
+
+SEARCH_TABLE = 'invoices_search'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# Order ids waiting for a reindex at commit, per database alias; asgiref Local like the
+# connections themselves, so threads and async tasks don't share them
+_dirty = Local()
+
+
+class SearchError(Exception):
+    """Raised for unusable queries or an unsupported database backend."""
+    pass
+
+
+def customer_text(customer) -> str:
+    return ' '.join(filter(None, (customer.name, customer.phone, customer.gstin)))
+
+
+class _SQLiteBackend:
+    create_sql = (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        "USING fts5(customer, invoice_no, items, tokenize='unicode61')"
+    )
+    drop_sql = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+    upsert_sql = f"INSERT OR REPLACE INTO {SEARCH_TABLE}(rowid, customer, invoice_no, items) VALUES (%s, %s, %s, %s)"
+    set_customer_sql = f"UPDATE {SEARCH_TABLE} SET customer = %s WHERE rowid = %s"
+    set_invoice_no_sql = f"UPDATE {SEARCH_TABLE} SET invoice_no = %s WHERE rowid = %s"
+    delete_sql = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s"
+    # bm25 column weights: invoice number and customer matches rank above item text
+    search_sql = (
+        f"SELECT rowid, -bm25({SEARCH_TABLE}, 2.0, 4.0, 1.0) AS score FROM {SEARCH_TABLE} "
+        f"WHERE {SEARCH_TABLE} MATCH %s ORDER BY score DESC LIMIT %s"
+    )
+
+    @staticmethod
+    def build_query(terms) -> tuple:
+        # Quoted prefix terms, OR'ed: rows matching more (and rarer) terms rank higher
+        match = ' OR '.join('"{}"*'.format(t.replace('"', '')) for t in terms)
+        return (match,)
+
+
+class _MySQLBackend:
+    create_sql = (
+        f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+        "order_id BIGINT NOT NULL PRIMARY KEY, customer TEXT NOT NULL, "
+        "invoice_no VARCHAR(32) NOT NULL, items MEDIUMTEXT NOT NULL, "
+        f"FULLTEXT KEY {SEARCH_TABLE}_ft (customer, invoice_no, items)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+    drop_sql = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+    upsert_sql = f"REPLACE INTO {SEARCH_TABLE} (order_id, customer, invoice_no, items) VALUES (%s, %s, %s, %s)"
+    set_customer_sql = f"UPDATE {SEARCH_TABLE} SET customer = %s WHERE order_id = %s"
+    set_invoice_no_sql = f"UPDATE {SEARCH_TABLE} SET invoice_no = %s WHERE order_id = %s"
+    delete_sql = f"DELETE FROM {SEARCH_TABLE} WHERE order_id = %s"
+    search_sql = (
+        f"SELECT order_id, MATCH(customer, invoice_no, items) AGAINST (%s IN BOOLEAN MODE) AS score "
+        f"FROM {SEARCH_TABLE} WHERE MATCH(customer, invoice_no, items) AGAINST (%s IN BOOLEAN MODE) "
+        "ORDER BY score DESC LIMIT %s"
+    )
+
+    @staticmethod
+    def build_query(terms) -> tuple:
+        # Boolean mode with optional prefix terms behaves like OR with relevance ranking
+        match = ' '.join(f'{t}*' for t in terms)
+        return (match, match)
+
+
+_BACKENDS = {'sqlite': _SQLiteBackend, 'mysql': _MySQLBackend}
+
+
+def backend_for(connection):
+    try:
+        return _BACKENDS[connection.vendor]
+    except KeyError:
+        raise SearchError(f"Full-text search is not supported on {connection.vendor}.")
+
+
+class SearchIndex:
+    """Maintains and queries the per-order search documents."""
+
+    @staticmethod
+    def _write(statement: str, params) -> None:
+        """Run one of the backend's write statements; no-op on backends without search."""
+        from .models import Order
+        connection = connections[router.db_for_write(Order)]
+        backend = _BACKENDS.get(connection.vendor)
+        if backend is None:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(getattr(backend, statement), params)
+
+    @classmethod
+    def index_orders(cls, order_ids) -> None:
+        """(Re)build the documents of several orders: one query per table, one executemany."""
+        from .models import Order, OrderItem
+        # Read from the primary: this runs right after the commit, before the replica has it
+        alias = router.db_for_write(Order)
+        descriptions = defaultdict(list)
+        for order_id, description in (
+            OrderItem.objects.using(alias).filter(order_id__in=order_ids)
+            .order_by('order_id', 'sno').values_list('order_id', 'description')
+        ):
+            descriptions[order_id].append(description)
+        cls.index_many([
+            [
+                order.pk,
+                customer_text(order.customer),
+                order.invoice.invoice_no if hasattr(order, 'invoice') else '',
+                ' '.join(descriptions[order.pk]),
+            ]
+            for order in Order.objects.using(alias).filter(pk__in=order_ids).select_related('customer', 'invoice')
+        ])
+
+    @classmethod
+    def mark_dirty(cls, order_id) -> None:
+        """
+        Rebuild the order's document when the current transaction commits (at once in
+        autocommit), however many of its rows the transaction writes.
+        """
+        from .models import Order
+        alias = router.db_for_write(Order)
+        dirty = getattr(_dirty, alias, None)
+        if dirty is None:
+            dirty = set()
+            setattr(_dirty, alias, dirty)
+        dirty.add(order_id)
+        # One callback per call, but only the first to run finds ids left. Ids marked in
+        # a rolled-back transaction are picked up by the next commit; rebuilding them is harmless.
+        transaction.on_commit(lambda: cls._flush(alias), using=alias)
+
+    @classmethod
+    def _flush(cls, alias) -> None:
+        dirty = getattr(_dirty, alias, None)
+        if dirty:
+            order_ids = list(dirty)
+            dirty.clear()
+            cls.index_orders(order_ids)
+
+    @classmethod
+    def set_customer(cls, customer) -> None:
+        text = customer_text(customer)
+        for order_id in customer.orders.values_list('pk', flat=True).iterator():
+            cls._write('set_customer_sql', [text, order_id])
+
+    @classmethod
+    def set_invoice_no(cls, order_id, invoice_no: str) -> None:
+        cls._write('set_invoice_no_sql', [invoice_no, order_id])
+
+    @classmethod
+    def remove_order(cls, order_id) -> None:
+        cls._write('delete_sql', [order_id])
+
+    @staticmethod
+    def index_many(documents) -> None:
+        """Upsert [order_id, customer text, invoice_no, item text] rows in one executemany."""
+        from .models import Order
+        connection = connections[router.db_for_write(Order)]
+        backend = _BACKENDS.get(connection.vendor)
+        if backend is None or not documents:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(backend.upsert_sql, documents)
+
+    @staticmethod
+    def rebuild(connection, Order, batch_size: int = 1000) -> int:
+        """
+        Recreate every document. Takes the Order model as an argument so
+        migrations can pass their historical model.
+        """
+        backend = backend_for(connection)
+        count = 0
+        with connection.cursor() as cursor:
+            cursor.execute(backend.drop_sql)
+            cursor.execute(backend.create_sql)
+            last_pk = 0
+            while True:
+                orders = list(
+                    Order.objects.using(connection.alias)
+                    .filter(pk__gt=last_pk)
+                    .select_related('customer', 'invoice')
+                    .prefetch_related('items')
+                    .order_by('pk')[:batch_size]
+                )
+                if not orders:
+                    break
+                last_pk = orders[-1].pk
+                cursor.executemany(backend.upsert_sql, [
+                    [
+                        order.pk,
+                        customer_text(order.customer),
+                        order.invoice.invoice_no if hasattr(order, 'invoice') else '',
+                        ' '.join(item.description for item in sorted(order.items.all(), key=lambda i: i.sno)),
+                    ]
+                    for order in orders
+                ])
+                count += len(orders)
+        return count
+
+    @staticmethod
+    def search(query: str, limit: int = DEFAULT_LIMIT) -> list:
+        """[(order_id, score)] best first. Reads go through the router (replica-aware)."""
+        from .models import Order
+        terms = _TERM_RE.findall(query or '')
+        if not terms:
+            raise SearchError("Search query must contain at least one word.")
+        connection = connections[router.db_for_read(Order)]
+        backend = backend_for(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(backend.search_sql, [*backend.build_query(terms), limit])
+            return [(row[0], float(row[1])) for row in cursor.fetchall()]
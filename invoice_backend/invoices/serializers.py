@@ -1,10 +1,93 @@
 """
 Serializers for Order creation API.
 """
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
 from rest_framework import serializers
 
 from .models import Customer, Order, OrderItem
 
+_PAISE = Decimal('0.01')
+_HALF_PAISA = Decimal('0.005')
+# Limits of the fields OrderItemSerializer generates from the model (used by the fast path)
+_SNO_MAX = 32767
+_DESCRIPTION_MAX_LENGTH = OrderItem._meta.get_field('description').max_length
+_DECIMAL_MAX_DIGITS = {
+    name: OrderItem._meta.get_field(name).max_digits for name in ('quantity', 'rate', 'amount')
+}
+# Characters DRF CharField rejects (ProhibitNullCharactersValidator, ProhibitSurrogateCharactersValidator)
+_PROHIBITED_CHARS_RE = re.compile('[\x00\ud800-\udfff]')
+
+
+def amount_matches(quantity: Decimal, rate: Decimal, amount: Decimal) -> bool:
+    """
+    amount == quantity × rate, allowing for rate having been rounded to paise
+    (the billing screen sends rate = amount / quantity rounded to 2 places).
+    """
+    return abs(amount - quantity * rate) <= (abs(quantity) + 1) * _HALF_PAISA
+
+
+def _fast_decimal(value, max_digits: int):
+    """Same result as DRF DecimalField(max_digits, decimal_places=2) for valid input, else None."""
+    if type(value) is str:
+        text = value.strip()
+    elif type(value) is int or type(value) is float:
+        text = str(value)
+    else:
+        return None
+    if len(text) > 1000:
+        return None
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not number.is_finite():
+        return None
+    _, digits, exponent = number.as_tuple()
+    if exponent >= 0:
+        total, places = len(digits) + exponent, 0
+    elif len(digits) > -exponent:
+        total, places = len(digits), -exponent
+    else:
+        total = places = -exponent
+    if total > max_digits or places > 2 or total - places > max_digits - 2:
+        return None
+    return number.quantize(_PAISE)
+
+
+def _fast_item(data):
+    """
+    Validated data for one well-formed item in a single pass, or None.
+    None means "not obviously valid": the caller runs the full serializer, which
+    produces the validated data or the exact DRF errors.
+    """
+    if type(data) is not dict:
+        return None
+    sno = data.get('sno')
+    description = data.get('description')
+    hsn_sac = data.get('hsn_sac', '998313')
+    if type(sno) is not int or not 0 <= sno <= _SNO_MAX:
+        return None
+    if type(description) is not str or type(hsn_sac) is not str:
+        return None
+    description = description.strip()
+    hsn_sac = hsn_sac.strip()
+    if not description or not hsn_sac or len(description) > _DESCRIPTION_MAX_LENGTH:
+        return None
+    if _PROHIBITED_CHARS_RE.search(description) or _PROHIBITED_CHARS_RE.search(hsn_sac):
+        return None
+    quantity = _fast_decimal(data.get('quantity'), _DECIMAL_MAX_DIGITS['quantity'])
+    rate = _fast_decimal(data.get('rate'), _DECIMAL_MAX_DIGITS['rate'])
+    amount = _fast_decimal(data.get('amount'), _DECIMAL_MAX_DIGITS['amount'])
+    if quantity is None or rate is None or amount is None or not amount_matches(quantity, rate, amount):
+        return None
+    return {
+        'sno': sno, 'description': description, 'hsn_sac': hsn_sac,
+        'quantity': quantity, 'rate': rate, 'amount': amount,
+    }
+
 
 class CustomerSerializer(serializers.ModelSerializer):
     """Customer data for order creation."""
@@ -21,6 +104,20 @@ class CustomerSerializer(serializers.ModelSerializer):
         }
 
 
+class OrderItemListSerializer(serializers.ListSerializer):
+    """
+    Item list with a single-pass fast path: well-formed items skip DRF's per-field
+    machinery; anything else goes through OrderItemSerializer for identical errors.
+    run_child_validation is only called by DRF 3.15+, hence the requirements floor.
+    """
+
+    def run_child_validation(self, data):
+        validated = _fast_item(data)
+        if validated is None:
+            return super().run_child_validation(data)
+        return validated
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     """Line item for order creation."""
 
@@ -29,6 +126,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['sno', 'description', 'hsn_sac', 'quantity', 'rate', 'amount']
+        list_serializer_class = OrderItemListSerializer
+
+    def validate(self, attrs):
+        if not amount_matches(attrs['quantity'], attrs['rate'], attrs['amount']):
+            raise serializers.ValidationError({
+                'amount': [f"Amount must equal quantity × rate ({attrs['quantity'] * attrs['rate']:.2f})."],
+            })
+        return attrs
 
 
 class OrderCreateSerializer(serializers.Serializer):
@@ -42,17 +147,22 @@ class OrderCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError("At least one item is required.")
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
+        # One transaction, so an order is never visible (or invoiced) without all its items
         customer_data = validated_data.pop('customer')
         items_data = validated_data.pop('items')
 
         customer = Customer.objects.create(**customer_data)
 
-        order = Order.objects.create(customer=customer)
+        order = Order.objects.create(customer=customer, **validated_data)
 
-        for i, item_data in enumerate(items_data, start=1):
-            data = dict(item_data)
-            data['sno'] = data.get('sno', i)
-            OrderItem.objects.create(order=order, **data)
+        # Items share the order's sync version and go in one INSERT: a save() per item
+        # would bump the global ChangeCounter once per item while holding its row lock.
+        # bulk_create sends no post_save; the order's own save already marked it for reindexing.
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, version=order.version, **{'sno': i, **item_data})
+            for i, item_data in enumerate(items_data, start=1)
+        ])
 
         return order
@@ -1,17 +1,32 @@
 """
-Invoice generation service: fetch order, compute tax, generate PDF, store record.
+Invoice generation service: fetch order, compute tax, snapshot, generate PDF, store record.
 Uses transaction atomicity and prevents duplicate invoice generation.
 """
 import os
-from decimal import Decimal
+import re
 
 from django.db import transaction
-from django.core.files.base import ContentFile
+from django.db.models import Sum
+from django.core.files.uploadedfile import TemporaryUploadedFile
 
 from .models import Shop, Order, Invoice
-from .utils import get_tax_breakdown, amount_to_words_indian
+from .utils import get_tax_breakdown
 from .invoice_number import get_next_invoice_number
-from .pdf_generator import build_invoice_pdf
+from .snapshot import ITEM_FIELDS, build_snapshot, copy_order_lines, invoice_items, render_args
+from .admission import admission
+
+# Line items fetched per DB round trip when rendering very large orders
+PDF_ITEMS_CHUNK_SIZE = 500
+# Imported invoice numbers can hold '/' (a storage subdirectory) or spaces
+_UNSAFE_FILENAME_CHARS = re.compile(r'\W')
+ORDER_TOTAL_FIELDS = [
+    'total_before_tax', 'cgst_amount', 'sgst_amount', 'igst_amount', 'total_amount', 'is_inter_state',
+]
+
+
+def pdf_filename(invoice_no: str) -> str:
+    """Storage file name for an invoice's PDF; '/' and other separators become '_'."""
+    return f"invoice_{_UNSAFE_FILENAME_CHARS.sub('_', invoice_no)}.pdf"
 
 
 class InvoiceGenerationError(Exception):
@@ -33,12 +48,11 @@ class InvoiceGenerationService:
         return shop
 
     @staticmethod
-    def compute_order_totals(order: Order) -> None:
-        """Recalculate order subtotal and tax from items; save to order."""
-        items = order.items.all().order_by('sno')
-        if not items.exists():
+    def compute_order_totals(order: Order, save: bool = True) -> None:
+        """Recalculate order subtotal and tax from items; save to order unless save=False."""
+        total_before_tax = order.items.aggregate(total=Sum('amount'))['total']
+        if total_before_tax is None:
             raise InvoiceGenerationError("Order has no items.")
-        total_before_tax = sum((item.amount for item in items), Decimal('0'))
         breakdown = get_tax_breakdown(total_before_tax, order.customer.state_code or '')
         order.total_before_tax = breakdown['total_before_tax']
         order.cgst_amount = breakdown['cgst_amount']
@@ -46,58 +60,149 @@ class InvoiceGenerationService:
         order.igst_amount = breakdown['igst_amount']
         order.total_amount = breakdown['total_amount']
         order.is_inter_state = breakdown['is_inter_state']
-        order.save(update_fields=[
-            'total_before_tax', 'cgst_amount', 'sgst_amount', 'igst_amount',
-            'total_amount', 'is_inter_state',
-        ])
+        if save:
+            order.save(update_fields=ORDER_TOTAL_FIELDS)
 
     @classmethod
     def generate_for_order(cls, order_id: int, email_invoice: bool = False) -> Invoice:
         """
         Generate invoice for order_id. Idempotent: if invoice already exists, returns it.
         Uses transaction to prevent duplicate invoice numbers.
+        Raises RenderBusyError if no render slot frees up in time; nothing is saved then.
+        An existing invoice without a PDF (bulk-imported history) gets it rendered here.
         """
-        with transaction.atomic():
-            order = Order.objects.select_related('customer').filter(pk=order_id).first()
+        existing = Invoice.objects.filter(order_id=order_id).first()
+        if existing and existing.pdf_file:
+            return existing
+        # Wait for a slot before opening the transaction, so queued requests hold no DB locks
+        with admission.slot(), transaction.atomic():
+            # Lock the order row: a concurrent generate for the same order waits here and
+            # then finds the invoice below instead of inserting a second one
+            order = Order.objects.select_related('customer').select_for_update(of=('self',)).filter(pk=order_id).first()
             if not order:
                 raise InvoiceGenerationError("Order not found.")
             existing = getattr(order, 'invoice', None)
             if existing:
+                if not existing.pdf_file:
+                    cls.render_pdf(existing)
                 return existing
 
             shop = cls.get_shop()
-            cls.compute_order_totals(order)
+            cls.compute_order_totals(order, save=False)
 
             invoice_no = get_next_invoice_number(prefix=shop.invoice_prefix)
             from django.utils import timezone
             invoice_date = timezone.now().date()
 
-            pdf_buffer = build_invoice_pdf(
-                shop=shop,
-                order=order,
-                invoice_no=invoice_no,
-                invoice_date=str(invoice_date),
-                amount_in_words=amount_to_words_indian(order.total_amount),
+            snapshot = build_snapshot(shop, order, invoice_no, invoice_date)
+            invoice = Invoice(order=order, invoice_no=invoice_no, invoice_date=invoice_date, snapshot=snapshot)
+            # Items are locked so the lines copied below are the ones rendered
+            items = (
+                order.items.select_for_update().order_by('sno')
+                .values_list(*ITEM_FIELDS)
+                .iterator(chunk_size=PDF_ITEMS_CHUNK_SIZE)
             )
-
-            invoice = Invoice.objects.create(
-                order=order,
-                invoice_no=invoice_no,
-                invoice_date=invoice_date,
-            )
-            filename = f"invoice_{invoice_no.replace('-', '_')}.pdf"
-            invoice.pdf_file.save(filename, ContentFile(pdf_buffer.read()), save=True)
+            pdf_file = cls._render_file(invoice, items)
+            try:
+                # Versioned writes last: the first one takes the global ChangeCounter row
+                # lock until commit, so it must not be held across the render
+                order.save(update_fields=ORDER_TOTAL_FIELDS)
+                invoice.pdf_file.save(pdf_file.name, pdf_file, save=False)
+                invoice.save()
+                copy_order_lines(invoice)
+            finally:
+                pdf_file.close()
 
         if email_invoice:
             cls._send_invoice_email(invoice)
         return invoice
 
+    @staticmethod
+    def get_snapshot(invoice: Invoice) -> dict:
+        """
+        Invoice snapshot header. Invoices generated before snapshots existed get one
+        (and their lines) built from the current rows, saved once, so later renders are
+        reproducible too.
+        """
+        if invoice.snapshot:
+            return invoice.snapshot
+        order = Order.objects.select_related('customer').get(pk=invoice.order_id)
+        with transaction.atomic():
+            copy_order_lines(invoice)
+            invoice.snapshot = build_snapshot(
+                InvoiceGenerationService.get_shop(), order, invoice.invoice_no, invoice.invoice_date,
+            )
+            invoice.save(update_fields=['snapshot'])
+        return invoice.snapshot
+
+    @classmethod
+    def _render_file(cls, invoice: Invoice, items=None) -> TemporaryUploadedFile:
+        """
+        Render the invoice PDF from its snapshot alone into a temp file on disk;
+        FileSystemStorage moves it into place instead of copying, so the PDF is never
+        held in memory. items: item rows (default: the invoice's lines, streamed).
+        The caller saves and closes the file.
+        """
+        snapshot = cls.get_snapshot(invoice)
+        if items is None:
+            items = invoice_items(invoice.pk, snapshot)
+        return cls.render_snapshot(snapshot, items)
+
+    @staticmethod
+    def render_snapshot(snapshot: dict, items) -> TemporaryUploadedFile:
+        """
+        Render a snapshot and its item rows into a temp file named after the invoice
+        number. Callers hold a render slot, and save or close the file.
+        """
+        # reportlab is heavy; keep it out of migrate/check and other commands
+        from django.conf import settings
+        from .pdf_generator import build_invoice_pdf
+        pdf_file = TemporaryUploadedFile(pdf_filename(snapshot['invoice_no']), 'application/pdf', 0, None)
+        try:
+            build_invoice_pdf(
+                **render_args(snapshot, items),
+                output=pdf_file.file,
+                compact=settings.PDF_COMPACT,
+                linearize=settings.PDF_LINEARIZE,
+            )
+            pdf_file.size = os.path.getsize(pdf_file.temporary_file_path())
+        except BaseException:
+            pdf_file.close()
+            raise
+        return pdf_file
+
+    @classmethod
+    def render_pdf(cls, invoice: Invoice) -> None:
+        """
+        Render the invoice PDF and store it on invoice.pdf_file.
+        Callers hold a render slot (admission.slot()).
+        """
+        pdf_file = cls._render_file(invoice)
+        old_name = invoice.pdf_file.name if invoice.pdf_file else None
+        try:
+            invoice.pdf_file.save(pdf_file.name, pdf_file, save=True)
+        finally:
+            pdf_file.close()
+        # Only once the new file is stored and recorded, so a failed save keeps the old PDF
+        if old_name and old_name != invoice.pdf_file.name:
+            invoice.pdf_file.storage.delete(old_name)
+
+    @classmethod
+    def rerender(cls, invoice_id: int) -> Invoice:
+        """Re-render a stored invoice: one primary-key fetch, no joins on live rows."""
+        invoice = Invoice.objects.filter(pk=invoice_id).first()
+        if not invoice:
+            raise InvoiceGenerationError("Invoice not found.")
+        with admission.slot():
+            cls.render_pdf(invoice)
+        return invoice
+
     @staticmethod
     def _send_invoice_email(invoice: Invoice) -> None:
         """Send invoice PDF by email if Django email is configured and customer has email."""
         from django.core.mail import EmailMessage
         from django.conf import settings
-        to_email = (getattr(invoice.order.customer, 'email', None) or '').strip()
+        to_email = (InvoiceGenerationService.get_snapshot(invoice)['customer'].get('email') or '').strip()
         if not to_email:
             return
         if not invoice.pdf_file:
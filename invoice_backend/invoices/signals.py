@@ -0,0 +1,57 @@
+"""
+Signal handlers keeping derived data in sync with writes (full-text search documents,
+delta-sync tombstones).
+Connected in InvoicesConfig.ready().
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Customer, Order, OrderItem, Invoice, Product
+from .search import SearchIndex
+from .sync import SyncService
+
+
+@receiver(post_save, sender=Order)
+def index_order(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Only the customer is in the document; totals-only saves (invoicing) leave it alone
+    if raw or (update_fields is not None and not {'customer', 'customer_id'} & update_fields):
+        return
+    SearchIndex.mark_dirty(instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def unindex_order(sender, instance, **kwargs):
+    SearchIndex.remove_order(instance.pk)
+
+
+@receiver(post_save, sender=OrderItem)
+def index_order_item(sender, instance, raw=False, **kwargs):
+    # Marked, not rebuilt: an N-item order is indexed once at commit, not N times
+    if not raw:
+        SearchIndex.mark_dirty(instance.order_id)
+
+
+@receiver(post_delete, sender=OrderItem)
+def unindex_order_item(sender, instance, **kwargs):
+    SearchIndex.mark_dirty(instance.order_id)
+
+
+@receiver(post_save, sender=Invoice)
+def index_invoice(sender, instance, raw=False, **kwargs):
+    if not raw:
+        SearchIndex.set_invoice_no(instance.order_id, instance.invoice_no)
+
+
+@receiver(post_save, sender=Customer)
+def index_customer(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        SearchIndex.set_customer(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=Invoice)
+def record_sync_deletion(sender, instance, **kwargs):
+    SyncService.record_deletion(sender, instance.pk)
@@ -0,0 +1,97 @@
+"""
+Immutable invoice snapshot: everything the PDF needs, frozen at generation time.
+The header (shop, customer, totals) is stored on Invoice.snapshot and the line items as
+InvoiceLine rows, so re-renders never join live rows, later edits to Shop/Customer/Order
+rows never change an issued invoice, and lines are streamed instead of loaded at once.
+"""
+from types import SimpleNamespace
+from decimal import Decimal
+
+from django.db import connections, router
+
+from .models import InvoiceLine, OrderItem
+from .utils import amount_to_words_indian
+
+# Bump when the layout of the snapshot dict changes; readers branch on snapshot['v'].
+# v1 kept the items as a list inside the snapshot; v2 keeps them in InvoiceLine.
+SNAPSHOT_VERSION = 2
+
+SHOP_FIELDS = ('name', 'gstin', 'address', 'cell', 'state', 'state_code', 'bank_name', 'bank_account_no', 'bank_ifsc')
+CUSTOMER_FIELDS = ('name', 'address', 'gstin', 'phone', 'email', 'state_code')
+TOTAL_FIELDS = ('total_before_tax', 'cgst_amount', 'sgst_amount', 'igst_amount', 'total_amount')
+# Column order of item rows: InvoiceLine values_list rows and v1 / archived 'items' lists
+ITEM_FIELDS = ('sno', 'description', 'hsn_sac', 'quantity', 'rate', 'amount')
+DECIMAL_ITEM_FIELDS = ('quantity', 'rate', 'amount')
+# Lines fetched per DB round trip when streaming an invoice
+LINES_CHUNK_SIZE = 500
+
+
+def build_snapshot(shop, order, invoice_no: str, invoice_date) -> dict:
+    """Snapshot header for an order about to be invoiced; its lines go to InvoiceLine."""
+    customer = order.customer
+    return {
+        'v': SNAPSHOT_VERSION,
+        'invoice_no': invoice_no,
+        'invoice_date': str(invoice_date),
+        'order_id': order.pk,
+        'shop': {f: getattr(shop, f) for f in SHOP_FIELDS},
+        'customer': {f: getattr(customer, f) for f in CUSTOMER_FIELDS},
+        'totals': {f: str(getattr(order, f)) for f in TOTAL_FIELDS},
+        'is_inter_state': order.is_inter_state,
+        'amount_in_words': amount_to_words_indian(order.total_amount),
+    }
+
+
+def item_row(item) -> list:
+    """One item (model instance or namespace) as a JSON-safe row in ITEM_FIELDS order."""
+    return [item.sno, item.description, item.hsn_sac, str(item.quantity), str(item.rate), str(item.amount)]
+
+
+def copy_order_lines(invoice) -> None:
+    """
+    Freeze the order's items as the invoice's lines: one INSERT ... SELECT, so the
+    items never pass through Python whatever the order size.
+    """
+    connection = connections[router.db_for_write(InvoiceLine)]
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(OrderItem._meta.get_field(f).column) for f in ITEM_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(InvoiceLine._meta.db_table)} ({qn('invoice_id')}, {columns}) "
+            f"SELECT %s, {columns} FROM {qn(OrderItem._meta.db_table)} WHERE {qn('order_id')} = %s",
+            [invoice.pk, invoice.order_id],
+        )
+
+
+def invoice_items(invoice_id: int, snapshot: dict):
+    """The invoice's item rows (ITEM_FIELDS order) in sno order, streamed for v2 snapshots."""
+    if 'items' in snapshot:
+        # v1 snapshots, and archived copies, carry their items inline
+        return iter(snapshot['items'])
+    return (
+        InvoiceLine.objects.filter(invoice_id=invoice_id).order_by('sno')
+        .values_list(*ITEM_FIELDS).iterator(chunk_size=LINES_CHUNK_SIZE)
+    )
+
+
+def render_args(snapshot: dict, items) -> dict:
+    """
+    Keyword arguments for build_invoice_pdf, rebuilt from a snapshot header and its
+    item rows (see invoice_items) without any other query.
+    """
+    if snapshot.get('v') not in (1, SNAPSHOT_VERSION):
+        raise ValueError(f"Unsupported invoice snapshot version: {snapshot.get('v')!r}")
+    order = SimpleNamespace(
+        customer=SimpleNamespace(**snapshot['customer']),
+        is_inter_state=snapshot['is_inter_state'],
+        **{f: Decimal(v) for f, v in snapshot['totals'].items()},
+    )
+    return {
+        'shop': SimpleNamespace(**snapshot['shop']),
+        'order': order,
+        'invoice_no': snapshot['invoice_no'],
+        'invoice_date': snapshot['invoice_date'],
+        'amount_in_words': snapshot['amount_in_words'],
+        # Generator so the items table still pulls rows lazily
+        'items': (SimpleNamespace(**dict(zip(ITEM_FIELDS, row))) for row in items),
+    }
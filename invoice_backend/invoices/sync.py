@@ -0,0 +1,123 @@
+"""
+Delta sync for offline-first billing clients.
+GET returns only rows changed since a change token; POST applies batched offline sales.
+"""
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from .models import ChangeCounter, Product, Customer, Order, OrderItem, Invoice, SyncTombstone
+from .serializers import OrderCreateSerializer
+
+# Payload key → (model, fields sent to the client). id and version are always included.
+SYNC_MODELS = {
+    'products': (Product, [
+        'client_id', 'name', 'liters_per_can', 'quantity', 'dp',
+        'bill_percent', 'cd_percent', 'gst_percent', 'is_active', 'updated_at',
+    ]),
+    'customers': (Customer, [
+        'name', 'address', 'gstin', 'phone', 'email', 'state_code', 'updated_at',
+    ]),
+    'orders': (Order, [
+        'client_id', 'customer_id', 'order_date', 'total_before_tax', 'cgst_amount',
+        'sgst_amount', 'igst_amount', 'total_amount', 'is_inter_state', 'updated_at',
+    ]),
+    'order_items': (OrderItem, [
+        'order_id', 'sno', 'description', 'hsn_sac', 'quantity', 'rate', 'amount', 'updated_at',
+    ]),
+    'invoices': (Invoice, [
+        'order_id', 'invoice_no', 'invoice_date', 'created_at', 'updated_at',
+    ]),
+}
+
+_PAYLOAD_KEYS = {model: key for key, (model, _) in SYNC_MODELS.items()}
+
+
+class SyncError(Exception):
+    """Raised when a sync request is malformed (bad token or batch)."""
+    pass
+
+
+class SyncService:
+    """Service layer for delta sync."""
+
+    @staticmethod
+    def parse_token(raw) -> int:
+        """Parse the ?since= token; missing means full sync from 0."""
+        if raw in (None, ''):
+            return 0
+        try:
+            token = int(raw)
+        except (TypeError, ValueError):
+            raise SyncError("Invalid sync token.")
+        if token < 0:
+            raise SyncError("Invalid sync token.")
+        return token
+
+    @staticmethod
+    def changes_since(since: int) -> dict:
+        """
+        Rows with since < version <= token, where token is the counter read first.
+        Versions are handed out under a row lock held until commit, so every row
+        up to token is already visible; later writes are picked up next time.
+        """
+        token = ChangeCounter.current()
+        payload = {'token': token}
+        for key, (model, fields) in SYNC_MODELS.items():
+            payload[key] = list(
+                model.objects
+                .filter(version__gt=since, version__lte=token)
+                .order_by('version')
+                .values('id', 'version', *fields)
+            )
+        payload['deleted'] = [
+            {'type': key, 'id': object_id, 'version': version}
+            for key, object_id, version in
+            SyncTombstone.objects
+            .filter(version__gt=since, version__lte=token)
+            .order_by('version')
+            .values_list('model', 'object_id', 'version')
+        ]
+        return payload
+
+    @staticmethod
+    def record_deletion(model, pk) -> None:
+        """Tombstone for a deleted row of a synced model; no-op for other models."""
+        key = _PAYLOAD_KEYS.get(model)
+        if key is not None:
+            SyncTombstone.objects.create(model=key, object_id=pk, version=ChangeCounter.next_version())
+
+    @staticmethod
+    def apply_offline_sales(sales) -> list:
+        """
+        Create one order per offline sale ({client_id, customer, items}).
+        Idempotent per client_id, so a client may resend a batch after a dropped connection.
+        """
+        if not isinstance(sales, list):
+            raise SyncError("'sales' must be a list.")
+        results = []
+        for sale in sales:
+            if not isinstance(sale, dict):
+                raise SyncError("Each sale must be an object.")
+            try:
+                client_id = uuid.UUID(str(sale.get('client_id')))
+            except ValueError:
+                results.append({'client_id': sale.get('client_id'), 'errors': {'client_id': ['A valid UUID is required.']}})
+                continue
+
+            order_id = Order.objects.filter(client_id=client_id).values_list('id', flat=True).first()
+            if order_id is None:
+                serializer = OrderCreateSerializer(data=sale)
+                if not serializer.is_valid():
+                    results.append({'client_id': str(client_id), 'errors': serializer.errors})
+                    continue
+                try:
+                    with transaction.atomic():
+                        order_id = serializer.save(client_id=client_id).id
+                except IntegrityError:
+                    # A concurrent upload of the same sale committed first: return its order
+                    order_id = Order.objects.filter(client_id=client_id).values_list('id', flat=True).first()
+                    if order_id is None:
+                        raise
+            results.append({'client_id': str(client_id), 'order_id': order_id})
+        return results
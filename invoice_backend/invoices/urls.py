@@ -1,8 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under ASGI (config/asgi.py) invoice metadata, downloads and GST exports are served by
+# async views: Django would buffer a sync streaming body whole before sending it
+if settings.ASYNC_VIEWS:
+    from . import async_views as invoice_views
+else:
+    invoice_views = views
+
 urlpatterns = [
     path('orders/', views.create_order),
-    path('generate-invoice/<int:order_id>/', views.generate_invoice),
-    path('invoice/<int:order_id>/pdf/', views.download_invoice_pdf),
+    path('generate-invoice/<int:order_id>/', invoice_views.generate_invoice),
+    path('invoice/<int:order_id>/pdf/', invoice_views.download_invoice_pdf),
+    path('invoice-preview/', views.invoice_preview),
+    path('sync/', views.sync),
+    path('search/', views.search),
+    path('render-status/', views.render_status),
+    path('gst-export/<str:kind>/', invoice_views.gst_export),
 ]
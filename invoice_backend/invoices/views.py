@@ -1,14 +1,33 @@
 """
 API endpoints for invoice generation and download.
 """
-from django.http import FileResponse, Http404
+import datetime
+import re
+
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from .models import Invoice
+from config.db_router import replica_reads
+
+from .models import Invoice, Order
 from .serializers import OrderCreateSerializer
 from .services import InvoiceGenerationService, InvoiceGenerationError
+from .sync import SyncService, SyncError
+from .archive import ArchiveService
+from .search import SearchIndex, SearchError, DEFAULT_LIMIT, MAX_LIMIT
+from .admission import admission, RenderBusyError
+from .preview import InvoicePreviewService
+from .gst_export import GstExportService, GstExportError
+
+_PATH_SEPARATORS = re.compile(r'[\\/]')
+
+
+def download_name(invoice_no: str) -> str:
+    """Attachment file name; FileResponse would keep only the part after a '/'."""
+    return f"invoice_{_PATH_SEPARATORS.sub('_', invoice_no)}.pdf"
 
 
 @api_view(['POST', 'GET'])
@@ -20,14 +39,25 @@ def generate_invoice(request, order_id):
     Prevents duplicate: returns existing invoice if already generated.
     """
     if request.method == 'GET':
-        invoice = Invoice.objects.filter(order_id=order_id).select_related('order').first()
+        with replica_reads():
+            invoice = Invoice.objects.filter(order_id=order_id).defer('snapshot').first()
+            archived = None if invoice else ArchiveService.find_archived_invoice(order_id)
+        if archived:
+            return Response({
+                'invoice_no': archived.invoice_no,
+                'invoice_date': str(archived.invoice_date),
+                'order_id': order_id,
+                'pdf_url': request.build_absolute_uri(f'/api/invoice/{order_id}/pdf/') if archived.pdf_member or archived.has_snapshot else None,
+                'archived': True,
+            })
         if not invoice:
             raise Http404("Invoice not found for this order.")
         return Response({
             'invoice_no': invoice.invoice_no,
             'invoice_date': str(invoice.invoice_date),
             'order_id': order_id,
-            'pdf_url': request.build_absolute_uri(invoice.pdf_file.url) if invoice.pdf_file else None,
+            # Without a stored PDF (imported history) the download endpoint renders it
+            'pdf_url': request.build_absolute_uri(invoice.pdf_file.url if invoice.pdf_file else f'/api/invoice/{order_id}/pdf/'),
         })
 
     # POST
@@ -39,6 +69,8 @@ def generate_invoice(request, order_id):
         )
     except InvoiceGenerationError as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except RenderBusyError as e:
+        return _render_busy(e)
     except ValueError:
         return Response({'error': 'Invalid order_id'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -52,6 +84,14 @@ def generate_invoice(request, order_id):
     }, status=status.HTTP_201_CREATED)
 
 
+def _render_busy(e: RenderBusyError) -> Response:
+    return Response(
+        {'error': str(e)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(e.retry_after)},
+    )
+
+
 @api_view(['POST'])
 def create_order(request):
     """
@@ -65,18 +105,184 @@ def create_order(request):
     return Response({'order_id': order.id}, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+def invoice_preview(request):
+    """
+    Preview the invoice for an order payload (same body as POST /api/orders/) without saving it.
+    JSON by default; ?html=1 returns the server-rendered invoice layout.
+    No invoice number is allocated and no PDF is rendered.
+    """
+    serializer = OrderCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    as_html = request.query_params.get('html', '').lower() in ('1', 'true', 'yes')
+    try:
+        preview = InvoicePreviewService.preview(serializer.validated_data, as_html=as_html)
+    except InvoiceGenerationError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if as_html:
+        return HttpResponse(preview, content_type='text/html; charset=utf-8')
+    return Response(preview)
+
+
 @api_view(['GET'])
+@replica_reads()
 def download_invoice_pdf(request, order_id):
-    """Download PDF for order. Admin or anyone with link; protect in production with auth."""
-    invoice = Invoice.objects.filter(order_id=order_id).first()
-    if not invoice or not invoice.pdf_file:
-        raise Http404("Invoice or PDF not found.")
+    """
+    Download PDF for order. Admin or anyone with link; protect in production with auth.
+    A missing PDF (imported history) is rendered first, under a render slot (503 when busy).
+    """
+    invoice = Invoice.objects.filter(order_id=order_id).defer('snapshot').first()
+    if not invoice:
+        return _download_archived_pdf(order_id)
+    if not invoice.pdf_file:
+        try:
+            invoice = InvoiceGenerationService.generate_for_order(order_id=invoice.order_id)
+        except RenderBusyError as e:
+            return _render_busy(e)
+        except InvoiceGenerationError:
+            raise Http404("Invoice or PDF not found.")
     try:
         f = invoice.pdf_file.open('rb')
         return FileResponse(
             f,
             as_attachment=True,
-            filename=f"invoice_{invoice.invoice_no}.pdf",
+            filename=download_name(invoice.invoice_no),
         )
     except (OSError, ValueError):
         raise Http404("File not found.")
+
+
+def _download_archived_pdf(order_id):
+    """
+    Serve the PDF of an archived order from its financial year's pack, or render it from
+    the archived snapshot if it was archived without one.
+    """
+    archived = ArchiveService.find_archived_invoice(order_id)
+    if not archived:
+        raise Http404("Invoice or PDF not found.")
+    if not archived.pdf_pack:
+        try:
+            with admission.slot():
+                pdf = ArchiveService.render_archived_pdf(archived)
+        except RenderBusyError as e:
+            return _render_busy(e)
+        except KeyError:
+            raise Http404("Invoice or PDF not found.")
+        return FileResponse(pdf, as_attachment=True, filename=download_name(archived.invoice_no))
+    try:
+        pdf = ArchiveService.open_archived_pdf(archived)
+    except (OSError, KeyError):
+        raise Http404("File not found.")
+    # Streamed (and inflated) from the pack chunk by chunk
+    response = FileResponse(
+        pdf,
+        as_attachment=True,
+        filename=download_name(archived.invoice_no),
+        content_type='application/pdf',
+    )
+    response['Content-Length'] = str(pdf.size)
+    return response
+
+
+@api_view(['GET', 'POST'])
+def sync(request):
+    """
+    Delta sync for offline clients.
+    GET ?since=<token>: products, customers, orders, order_items and invoices changed after token,
+    rows deleted since then, and the new token to send next time. Omit since for a full sync.
+    POST {"sales": [{client_id, customer, items}, ...]}: create orders for offline sales (idempotent).
+    """
+    try:
+        if request.method == 'GET':
+            since = SyncService.parse_token(request.query_params.get('since'))
+            with replica_reads():
+                return Response(SyncService.changes_since(since))
+
+        sales = request.data.get('sales', []) if hasattr(request.data, 'get') else None
+        results = SyncService.apply_offline_sales(sales)
+    except SyncError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': results})
+
+
+@api_view(['GET'])
+@replica_reads()
+def search(request):
+    """
+    Full-text search: GET ?q=<words>[&limit=20].
+    Matches customer name/phone/GSTIN, invoice number and item descriptions; best match first.
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        hits = SearchIndex.search(request.query_params.get('q', ''), limit=limit)
+    except SearchError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    orders = Order.objects.select_related('customer', 'invoice').defer('invoice__snapshot').in_bulk([pk for pk, _ in hits])
+    results = []
+    for pk, score in hits:
+        order = orders.get(pk)
+        if not order:
+            continue
+        invoice = getattr(order, 'invoice', None)
+        results.append({
+            'order_id': order.pk,
+            'invoice_no': invoice.invoice_no if invoice else None,
+            'invoice_date': str(invoice.invoice_date) if invoice else None,
+            'customer': order.customer.name,
+            'phone': order.customer.phone,
+            'order_date': order.order_date,
+            'total_amount': order.total_amount,
+            'score': round(score, 4),
+        })
+    return Response({'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def render_status(request):
+    """
+    PDF render admission: slots in use and queued requests on this host, plus this worker's
+    wait/reject counters. Staff only.
+    """
+    return Response(admission.status())
+
+
+@api_view(['GET'])
+def gst_export(request, kind):
+    """
+    GST filing JSON for invoices dated in a period: GET ?from=YYYY-MM-DD&to=YYYY-MM-DD[&period=MMYYYY].
+    kind 'gstr1': GSTR-1 B2B/B2CL/B2CS/HSN sections; 'einvoice': JSON array of e-invoice payloads (B2B only).
+    Streamed as an attachment.
+    """
+    try:
+        start = datetime.date.fromisoformat(request.query_params.get('from', ''))
+        end = datetime.date.fromisoformat(request.query_params.get('to', ''))
+    except ValueError:
+        return Response({'error': "'from' and 'to' must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({'error': "'from' is after 'to'."}, status=status.HTTP_400_BAD_REQUEST)
+    if kind not in ('gstr1', 'einvoice'):
+        raise Http404("Unknown export.")
+    try:
+        with replica_reads():
+            if kind == 'gstr1':
+                chunks = GstExportService.gstr1(start, end, period=request.query_params.get('period')).iter_json()
+            else:
+                GstExportService.check_einvoices(start, end)
+                chunks = _replica_stream(GstExportService.iter_einvoices_json(start, end))
+    except GstExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(chunks, content_type='application/json')
+    response['Content-Disposition'] = f'attachment; filename="{kind}_{start:%Y%m%d}_{end:%Y%m%d}.json"'
+    return response
+
+
+def _replica_stream(chunks):
+    """Keep a lazily consumed export on the replica: the view's context has ended by then."""
+    with replica_reads():
+        yield from chunks
@@ -73,6 +73,28 @@ export async function generateInvoice(orderId: number): Promise<{
   return request(`/api/generate-invoice/${orderId}/`, { method: 'POST' });
 }
 
+export interface InvoicePreview {
+  invoice_no: null;
+  invoice_date: string;
+  customer: CustomerPayload;
+  totals: Record<
+    'total_before_tax' | 'cgst_amount' | 'sgst_amount' | 'igst_amount' | 'total_amount' |
+    'cgst_rate' | 'sgst_rate' | 'igst_rate',
+    string
+  >;
+  is_inter_state: boolean;
+  amount_in_words: string;
+  items: { sno: number; description: string; hsn_sac: string; quantity: string; rate: string; amount: string }[];
+}
+
+/** Invoice as it would be generated for this cart; nothing is saved and no number is used. */
+export async function previewInvoice(payload: OrderPayload): Promise<InvoicePreview> {
+  return request<InvoicePreview>('/api/invoice-preview/', {
+    method: 'POST',
+    body: JSON.stringify(payload),
+  });
+}
+
 export function getInvoicePdfUrl(orderId: number): string {
   return `${API_BASE.replace(/\/$/, '')}/api/invoice/${orderId}/pdf/`;
 }